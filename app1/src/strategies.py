@@ -1,7 +1,21 @@
+import math
 import backtrader as bt
 import numpy as np
 from collections import deque
 
+# Order states notify_order() waits through and gives up on, built once instead of as a list
+# per notification
+_PENDING = frozenset((bt.Order.Submitted, bt.Order.Accepted))
+_FAILED = frozenset((bt.Order.Canceled, bt.Order.Margin, bt.Order.Rejected))
+
+
+def exit_prices(entry_price, take_profit, stop_loss):
+    """Take-profit and stop-loss prices of a new position, fixed once instead of every bar"""
+    tp_price = entry_price * (1 + take_profit) if take_profit > 0 else math.inf
+    sl_price = entry_price * (1 - stop_loss) if entry_price else -math.inf
+    return tp_price, sl_price
+
+
 # -----------------------------
 # Existing Strategy: SmaCross
 # -----------------------------
@@ -38,10 +52,10 @@ class SmaCross(bt.Strategy):
                 self.order = self.close()
 
     def notify_order(self, order):
-        if order.status in [order.Submitted, order.Accepted]:
+        if order.status in _PENDING:
             return
 
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.entry_price = order.executed.price
                 self.log("BUY EXECUTED, Price: %.2f" % order.executed.price)
@@ -49,7 +63,7 @@ class SmaCross(bt.Strategy):
                 self.log("SELL EXECUTED, Price: %.2f" % order.executed.price)
                 self.entry_price = None
             self.order = None
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
+        elif order.status in _FAILED:
             self.log("Order Canceled/Margin/Rejected")
             self.order = None
 
@@ -80,6 +94,7 @@ class BollingerBreakoutStrategy(bt.Strategy):
         self.crossdown.plotinfo.plot = False
         self.order = None
         self.entry_price = None
+        self.tp_price = self.sl_price = None
 
     def next(self):
         if self.order:
@@ -91,28 +106,27 @@ class BollingerBreakoutStrategy(bt.Strategy):
         else:
             if self.entry_price is None:
                 self.entry_price = self.position.price
-            if self.p.take_profit > 0 and self.data.close[0] >= self.entry_price * (1 + self.p.take_profit):
-                self.order = self.close()
-                return
-            if self.entry_price and self.data.close[0] < self.entry_price * (1 - self.p.stop_loss):
-                self.order = self.close()
-                return
-            if self.crossdown < 0:
+                self.tp_price, self.sl_price = exit_prices(self.entry_price, self.p.take_profit,
+                                                           self.p.stop_loss)
+            px = self.data.close[0]
+            if px >= self.tp_price or px < self.sl_price or self.crossdown < 0:
                 self.order = self.close()
 
     def notify_order(self, order):
-        if order.status in [order.Submitted, order.Accepted]:
+        if order.status in _PENDING:
             return
 
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.entry_price = order.executed.price
+                self.tp_price, self.sl_price = exit_prices(self.entry_price, self.p.take_profit,
+                                                           self.p.stop_loss)
                 self.log("BUY EXECUTED, Price: %.2f" % order.executed.price)
             elif order.issell():
                 self.log("SELL EXECUTED, Price: %.2f" % order.executed.price)
                 self.entry_price = None
             self.order = None
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
+        elif order.status in _FAILED:
             self.log("Order Canceled/Margin/Rejected")
             self.order = None
 
@@ -144,6 +158,7 @@ class RsiMacdStrategy(bt.Strategy):
                                        period_signal=self.p.macd_signal)
         self.order = None
         self.entry_price = None
+        self.tp_price = self.sl_price = None
 
     def next(self):
         if self.order:
@@ -155,28 +170,28 @@ class RsiMacdStrategy(bt.Strategy):
         else:
             if self.entry_price is None:
                 self.entry_price = self.position.price
-            if self.p.take_profit > 0 and self.data.close[0] >= self.entry_price * (1 + self.p.take_profit):
-                self.order = self.close()
-                return
-            if self.entry_price and self.data.close[0] < self.entry_price * (1 - self.p.stop_loss):
-                self.order = self.close()
-                return
-            if self.rsi[0] > self.p.rsi_overbought or self.macd.macd[0] < self.macd.signal[0]:
+                self.tp_price, self.sl_price = exit_prices(self.entry_price, self.p.take_profit,
+                                                           self.p.stop_loss)
+            px = self.data.close[0]
+            if (px >= self.tp_price or px < self.sl_price
+                    or self.rsi[0] > self.p.rsi_overbought or self.macd.macd[0] < self.macd.signal[0]):
                 self.order = self.close()
 
     def notify_order(self, order):
-        if order.status in [order.Submitted, order.Accepted]:
+        if order.status in _PENDING:
             return
 
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.entry_price = order.executed.price
+                self.tp_price, self.sl_price = exit_prices(self.entry_price, self.p.take_profit,
+                                                           self.p.stop_loss)
                 self.log("BUY EXECUTED, Price: %.2f" % order.executed.price)
             elif order.issell():
                 self.log("SELL EXECUTED, Price: %.2f" % order.executed.price)
                 self.entry_price = None
             self.order = None
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
+        elif order.status in _FAILED:
             self.log("Order Canceled/Margin/Rejected")
             self.order = None
 
@@ -11,12 +11,14 @@ import pytz
 import json
 import uuid
 import asyncio
+import functools
 from dotenv import load_dotenv
 import matplotlib
 matplotlib.use('Agg')  # Use Agg backend to prevent display requirement
 
 # Import strategies
 from strategy import SmaCross, BollingerBreakoutStrategy, RsiMacdStrategy
+from feeds import ArrayData
 from candlestick_strategy import CandlestickPatternStrategy
 from candlestick_patterns import CANDLESTICK_PATTERNS
 
@@ -85,7 +87,9 @@ class AvailablePatternsResponse(BaseModel):
     patterns: List[str]
 
 # Helper functions
+@functools.lru_cache(maxsize=1)
 def get_alpaca_api():
+    """Shared Alpaca REST client, so backtests reuse one authenticated HTTP session"""
     return tradeapi.REST(
         key_id=ALPACA_API_KEY,
         secret_key=ALPACA_API_SECRET_KEY,
@@ -93,9 +97,10 @@ def get_alpaca_api():
         api_version='v2'
     )
 
-def fetch_data(ticker, start_date, end_date, timeframe):
+def fetch_data(ticker, start_date, end_date, timeframe, api=None):
     """Fetch historical data from Alpaca"""
-    api = get_alpaca_api()
+    if api is None:
+        api = get_alpaca_api()
     
     # Convert timeframe to Alpaca format
     if timeframe.lower() in ['1d', 'day', 'daily']:
@@ -153,8 +158,8 @@ def get_strategy_class(strategy_type):
     
     return strategies.get(strategy_type)
 
-async def run_backtest(backtest_id, request):
-    """Run backtest in background and save results"""
+async def run_backtest(backtest_id, request, api=None):
+    """Run backtest in background and save results; ``api`` defaults to the shared Alpaca client"""
     try:
         # Update status to "running"
         backtest_results[backtest_id]["status"] = "running"
@@ -164,7 +169,8 @@ async def run_backtest(backtest_id, request):
             request.ticker,
             request.start_date,
             request.end_date,
-            request.timeframe
+            request.timeframe,
+            api=api
         )
         
         if data.empty:
@@ -174,7 +180,7 @@ async def run_backtest(backtest_id, request):
         cerebro = bt.Cerebro()
         
         # Add data feed
-        data_feed = bt.feeds.PandasData(dataname=data)
+        data_feed = ArrayData(dataname=data)
         cerebro.adddata(data_feed)
         
         # Set initial cash
@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'trade')
+# Parquet schema metadata key holding the [start, end] days an entry fully covers
+_RANGE_KEY = b'trade.covered_range'
+
+
+def _cache_path(ticker, timeframe, adjustment):
+    key = hashlib.sha1(f"{ticker}|{timeframe}|{adjustment}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.parquet")
+
+
+def _load(path):
+    """Return the cached (start, end, bars) entry at path, or None"""
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path)
+    start, end = json.loads(table.schema.metadata[_RANGE_KEY])
+    return pd.Timestamp(start), pd.Timestamp(end), table.to_pandas()
+
+
+def _store(path, start, end, bars):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    table = pa.Table.from_pandas(bars)
+    # The covered day range rides along in the file's schema metadata, next to pandas' own
+    metadata = dict(table.schema.metadata or {})
+    metadata[_RANGE_KEY] = json.dumps([_day(start), _day(end)]).encode()
+    # Write to a temp file first so a concurrent run never reads a half-written cache entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _slice(bars, start, end):
+    """Bars from the start of day ``start`` through the end of day ``end``"""
+    if bars.empty:
+        return bars
+    index = bars.index
+    lo = pd.Timestamp(start, tz=index.tz)
+    hi = pd.Timestamp(end, tz=index.tz) + pd.Timedelta(days=1)
+    return bars[(index >= lo) & (index < hi)]
+
+
+def _day(ts):
+    return ts.strftime('%Y-%m-%d')
+
+
+def _plan(entry, start, end):
+    """
+    None when the cache entry covers the days ``start`` to ``end``, else
+    ``(fetch_start, extends_entry)``: the first day to download, and whether the download
+    is the tail of a request starting inside the entry (otherwise it is the whole range).
+    """
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    if entry is not None:
+        cached_start, cached_end, _ = entry
+        if cached_start <= start_ts and end_ts <= cached_end:
+            return None
+        if cached_start <= start_ts <= cached_end + pd.Timedelta(days=1):
+            return _day(cached_end + pd.Timedelta(days=1)), True
+    return start, False
+
+
+def missing_range(ticker, start, end, timeframe, adjustment='all', use_cache=True):
+    """
+    The ``(start, end)`` days ``cached_bars`` would pass to ``fetch`` for the same request,
+    or None when the request is served from disk. Lets a caller download several tickers
+    that miss the same days together and hand each its share through ``fetch``.
+    """
+    if not use_cache:
+        return start, end
+    plan = _plan(_load(_cache_path(ticker, timeframe, adjustment)), start, end)
+    return None if plan is None else (plan[0], end)
+
+
+def cached_bars(fetch, ticker, start, end, timeframe, adjustment='all', use_cache=True, today=None):
+    """
+    Return the bars for ``ticker`` from day ``start`` through day ``end``, calling
+    ``fetch(start, end)`` (both 'YYYY-MM-DD' strings) only for days that aren't cached yet.
+
+    Each ticker/timeframe/adjustment has one Parquet file under ``CACHE_DIR`` recording
+    the day range it fully covers in its metadata. A request inside that range is served from disk. A
+    request starting inside it but ending later only downloads the missing tail, which is
+    then merged in. Any other request is downloaded in full and replaces the entry. Days
+    from ``today`` on are never marked as covered, since their bars may still change, so
+    ranges reaching the present re-fetch their last day. Empty downloads are not cached.
+    Pass ``use_cache=False`` to always hit the network.
+    """
+    if not use_cache:
+        return fetch(start, end)
+
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    today = pd.Timestamp(today or datetime.date.today())
+    # Only days before today are final; the entry never claims to cover anything later
+    complete_through = min(end_ts, today - pd.Timedelta(days=1))
+
+    path = _cache_path(ticker, timeframe, adjustment)
+    entry = _load(path)
+    plan = _plan(entry, start, end)
+
+    if entry is not None:
+        cached_start, cached_end, bars = entry
+        if plan is None:
+            return _slice(bars, start, end)
+
+        fetch_start, extends_entry = plan
+        if extends_entry:
+            # Overlapping request: only download the days after the cached range
+            tail = fetch(fetch_start, end)
+            if not tail.empty:
+                bars = pd.concat([bars, tail])
+                bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+            if complete_through > cached_end and not bars.empty:
+                _store(path, cached_start, complete_through, bars)
+            return _slice(bars, start, end)
+
+    bars = fetch(start, end)
+    if not bars.empty and complete_through >= start_ts:
+        _store(path, start_ts, complete_through, bars)
+    return bars
+
+
+def clear_cache():
+    """Delete all cached bars, including entries left in the old pickle format"""
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(('.parquet', '.pkl')):
+                os.remove(os.path.join(CACHE_DIR, name))
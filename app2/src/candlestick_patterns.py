@@ -1,14 +1,160 @@
 import backtrader as bt
 import numpy as np
 
+
+# -----------------------------
+# Vectorized pattern masks
+# -----------------------------
+# Each mask applies the same rules as the matching indicator's next() to whole OHLC arrays and
+# returns a boolean array, one flag per bar. Lagged values before the first bar are NaN and every
+# comparison against NaN is False, which reproduces the len(self.data) warm-up guards.
+
+def _lag(x, k):
+    """Return x shifted k bars into the past, padded with NaN"""
+    if k == 0:
+        return x
+    out = np.full_like(x, np.nan)
+    out[k:] = x[:-k]
+    return out
+
+
+def _candle(o, h, l, c):
+    """Body/range ratio, upper/lower shadow ratios and a non-zero-range mask for each bar"""
+    rng = h - l
+    valid = rng != 0
+    safe = np.where(valid, rng, 1.0)
+    upper_body = np.maximum(o, c)
+    lower_body = np.minimum(o, c)
+    return np.abs(c - o) / safe, (h - upper_body) / safe, (lower_body - l) / safe, valid
+
+
+def _run_lengths(ok):
+    """Length of the run of consecutive True values ending at each index"""
+    idx = np.arange(ok.size)
+    return idx - np.maximum.accumulate(np.where(ok, -1, idx))
+
+
+def _steps_trend(steps, first, last):
+    """steps[t-i] holds for every i in [first, last], from one run-length pass instead of one pass per i"""
+    if last < first:
+        return np.ones(steps.shape, dtype=bool)
+    return _lag(_run_lengths(steps).astype(np.float64), first) >= last - first + 1
+
+
+def _lows_trend(l, first, last):
+    """All low[-i-1] >= low[-i] for i in [first, last], i.e. falling lows"""
+    return _steps_trend(_lag(l, 1) >= l, first, last)
+
+
+def _highs_trend(h, first, last):
+    """All high[-i-1] <= high[-i] for i in [first, last], i.e. rising highs"""
+    return _steps_trend(_lag(h, 1) <= h, first, last)
+
+
+def _at_or_below_lags(x, bars):
+    """All x[-i] >= x[0] for i in [1, bars], i.e. no lower value in the last bars"""
+    out = np.ones(x.shape, dtype=bool)
+    for i in range(1, bars + 1):
+        out &= _lag(x, i) >= x
+    return out
+
+
+def _three_candles(o, h, l, c):
+    """Lagged (open, close) pairs and body ratios for the candles at -2, -1 and 0"""
+    bars = [tuple(_lag(x, k) for x in (o, h, l, c)) for k in (2, 1, 0)]
+    candles = [_candle(*bar) for bar in bars]
+    valid = candles[0][3] & candles[1][3] & candles[2][3]
+    return [(bar[0], bar[3]) for bar in bars], [candle[0] for candle in candles], valid
+
+
+def _doji_mask(o, h, l, c, body_ratio=0.05):
+    body, _, _, valid = _candle(o, h, l, c)
+    return valid & (body <= body_ratio)
+
+
+def _hammer_mask(o, h, l, c, body_ratio=0.3, shadow_ratio=0.6, trend_bars=5, body_pos_ratio=0.3):
+    body, upper, lower, valid = _candle(o, h, l, c)
+    return (valid & (body <= body_ratio) & (lower >= shadow_ratio) & (upper <= 0.1)
+            & (upper <= body_pos_ratio) & _at_or_below_lags(l, trend_bars))
+
+
+def _shooting_star_mask(o, h, l, c, body_ratio=0.3, shadow_ratio=0.6, trend_bars=5, body_pos_ratio=0.3):
+    body, upper, lower, valid = _candle(o, h, l, c)
+    return (valid & (body <= body_ratio) & (upper >= shadow_ratio) & (lower <= 0.1)
+            & (lower <= body_pos_ratio) & _at_or_below_lags(-h, trend_bars))
+
+
+def _engulfing_masks(o, h, l, c, trend_bars=5):
+    """Separate bullish and bearish engulfing masks"""
+    po, pc = _lag(o, 1), _lag(c, 1)
+    curr_bullish = c > o
+    bullish = (curr_bullish & (pc <= po) & (o <= pc) & (c >= po)
+               & _lows_trend(l, 1, trend_bars))
+    bearish = (~curr_bullish & (pc > po) & (o >= pc) & (c <= po)
+               & _highs_trend(h, 1, trend_bars))
+    return bullish, bearish
+
+
+def _engulfing_mask(o, h, l, c, trend_bars=5):
+    bullish, bearish = _engulfing_masks(o, h, l, c, trend_bars)
+    return bullish | bearish
+
+
+def _morning_star_mask(o, h, l, c, gap_threshold=0.1, body_size_ratio=0.5, middle_body_ratio=0.3,
+                       trend_bars=5):
+    ((o1, c1), (o2, c2), (o3, c3)), (r1, r2, r3), valid = _three_candles(o, h, l, c)
+    return (valid & (c1 < o1) & (r1 >= body_size_ratio) & (r2 <= middle_body_ratio)
+            & (c3 > o3) & (r3 >= body_size_ratio) & (np.maximum(o2, c2) < np.minimum(o1, c1))
+            & (c3 >= (o1 + c1) / 2) & _lows_trend(l, 2, trend_bars + 1))
+
+
+def _evening_star_mask(o, h, l, c, gap_threshold=0.1, body_size_ratio=0.5, middle_body_ratio=0.3,
+                       trend_bars=5):
+    ((o1, c1), (o2, c2), (o3, c3)), (r1, r2, r3), valid = _three_candles(o, h, l, c)
+    return (valid & (c1 > o1) & (r1 >= body_size_ratio) & (r2 <= middle_body_ratio)
+            & (c3 < o3) & (r3 >= body_size_ratio) & (np.minimum(o2, c2) > np.maximum(o1, c1))
+            & (c3 <= (o1 + c1) / 2) & _highs_trend(h, 2, trend_bars + 1))
+
+
+def _three_white_soldiers_mask(o, h, l, c, body_size_ratio=0.5, trend_bars=5):
+    ((o1, c1), (o2, c2), (o3, c3)), (r1, r2, r3), valid = _three_candles(o, h, l, c)
+    return (valid & (c1 > o1) & (c2 > o2) & (c3 > o3)
+            & (r1 >= body_size_ratio) & (r2 >= body_size_ratio) & (r3 >= body_size_ratio)
+            & (o2 > o1) & (o2 < c1) & (o3 > o2) & (o3 < c2) & (c2 > c1) & (c3 > c2)
+            & _lows_trend(l, 2, trend_bars + 1))
+
+
+def _three_black_crows_mask(o, h, l, c, body_size_ratio=0.5, trend_bars=5):
+    ((o1, c1), (o2, c2), (o3, c3)), (r1, r2, r3), valid = _three_candles(o, h, l, c)
+    return (valid & (c1 < o1) & (c2 < o2) & (c3 < o3)
+            & (r1 >= body_size_ratio) & (r2 >= body_size_ratio) & (r3 >= body_size_ratio)
+            & (o2 < o1) & (o2 > c1) & (o3 < o2) & (o3 > c2) & (c2 < c1) & (c3 < c2)
+            & _highs_trend(h, 2, trend_bars + 1))
+
+
 class CandlestickPatternBase(bt.Indicator):
     """Base class for all candlestick pattern indicators"""
     lines = ('pattern',)
     plotinfo = dict(plot=True, subplot=False, plotlinelabels=True)
     plotlines = dict(pattern=dict(marker='o', markersize=8, color='lime', fillstyle='full'))
+    # Detections are plotted at the high or low of the bar _plot_ago bars back
+    _plot_line = 'high'
+    _plot_ago = 0
 
     def __init__(self):
-        self.lines.pattern = np.nan  # Default to no pattern
+        pass  # Line values start out as NaN, i.e. no pattern
+
+    def once(self, start, end):
+        # Batch mode: evaluate the pattern's mask over the whole preloaded series at once
+        o, h, l, c = (np.frombuffer(line.array, dtype=np.float64)[:end]
+                      for line in (self.data.open, self.data.high, self.data.low, self.data.close))
+        values = self._pattern_values(o, h, l, c, **self.p._getkwargs())
+        np.frombuffer(self.lines.pattern.array, dtype=np.float64)[start:end] = values[start:end]
+
+    def _pattern_values(self, o, h, l, c, **params):
+        """Plot value on bars where the pattern's PATTERN_MASKS entry is set, NaN elsewhere"""
+        detected = PATTERN_MASKS[_PATTERN_NAMES[type(self)]](o, h, l, c, **params)
+        return np.where(detected, _lag(h if self._plot_line == 'high' else l, self._plot_ago), np.nan)
 
 
 class Doji(CandlestickPatternBase):
@@ -66,6 +212,7 @@ class Hammer(CandlestickPatternBase):
         ('trend_bars', 5),          # Bars to look back for trend
         ('body_pos_ratio', 0.3),    # Body should be in the top 30% of the range
     )
+    _plot_line = 'low'
     
     def __init__(self):
         super(Hammer, self).__init__()
@@ -106,7 +253,7 @@ class Hammer(CandlestickPatternBase):
             if len(self.data) <= i:
                 downtrend = False
                 break
-            if self.data.low[-i] > self.data.low[0]:
+            if self.data.low[-i] < self.data.low[0]:
                 downtrend = False
                 break
         
@@ -180,7 +327,7 @@ class ShootingStar(CandlestickPatternBase):
             if len(self.data) <= i:
                 uptrend = False
                 break
-            if self.data.high[-i] < self.data.high[0]:
+            if self.data.high[-i] > self.data.high[0]:
                 uptrend = False
                 break
         
@@ -216,6 +363,10 @@ class Engulfing(CandlestickPatternBase):
         super(Engulfing, self).__init__()
         self.plotlines.pattern = dict(marker='o', markersize=8, color='blue', fillstyle='full')
     
+    def _pattern_values(self, o, h, l, c, **params):
+        bullish, bearish = _engulfing_masks(o, h, l, c, **params)
+        return np.where(bullish, l, np.where(bearish, h, np.nan))
+
     def next(self):
         if len(self.data) <= 1:
             self.lines.pattern[0] = np.nan
@@ -245,7 +396,7 @@ class Engulfing(CandlestickPatternBase):
             if len(self.data) <= i + 1:
                 downtrend = False
                 break
-            if self.data.low[-i-1] > self.data.low[-i]:
+            if self.data.low[-i-1] < self.data.low[-i]:
                 downtrend = False
                 break
         
@@ -255,7 +406,7 @@ class Engulfing(CandlestickPatternBase):
             if len(self.data) <= i + 1:
                 uptrend = False
                 break
-            if self.data.high[-i-1] < self.data.high[-i]:
+            if self.data.high[-i-1] > self.data.high[-i]:
                 uptrend = False
                 break
         
@@ -309,6 +460,8 @@ class MorningStar(CandlestickPatternBase):
         ('middle_body_ratio', 0.3), # Maximum ratio for middle candle
         ('trend_bars', 5),          # Bars to look back for trend
     )
+    _plot_line = 'low'
+    _plot_ago = 1
     
     def __init__(self):
         super(MorningStar, self).__init__()
@@ -375,7 +528,7 @@ class MorningStar(CandlestickPatternBase):
             if len(self.data) <= i + 1:
                 downtrend = False
                 break
-            if self.data.low[-i-1] > self.data.low[-i]:
+            if self.data.low[-i-1] < self.data.low[-i]:
                 downtrend = False
                 break
         
@@ -416,6 +569,7 @@ class EveningStar(CandlestickPatternBase):
         ('middle_body_ratio', 0.3), # Maximum ratio for middle candle
         ('trend_bars', 5),          # Bars to look back for trend
     )
+    _plot_ago = 1
     
     def __init__(self):
         super(EveningStar, self).__init__()
@@ -482,7 +636,7 @@ class EveningStar(CandlestickPatternBase):
             if len(self.data) <= i + 1:
                 uptrend = False
                 break
-            if self.data.high[-i-1] < self.data.high[-i]:
+            if self.data.high[-i-1] > self.data.high[-i]:
                 uptrend = False
                 break
         
@@ -578,7 +732,7 @@ class ThreeWhiteSoldiers(CandlestickPatternBase):
             if len(self.data) <= i + 1:
                 downtrend = False
                 break
-            if self.data.low[-i-1] > self.data.low[-i]:
+            if self.data.low[-i-1] < self.data.low[-i]:
                 downtrend = False
                 break
         
@@ -610,6 +764,7 @@ class ThreeBlackCrows(CandlestickPatternBase):
         ('body_size_ratio', 0.5),  # Minimum body/range ratio
         ('trend_bars', 5),         # Bars to look back for trend
     )
+    _plot_line = 'low'
     
     def __init__(self):
         super(ThreeBlackCrows, self).__init__()
@@ -673,7 +828,7 @@ class ThreeBlackCrows(CandlestickPatternBase):
             if len(self.data) <= i + 1:
                 uptrend = False
                 break
-            if self.data.high[-i-1] < self.data.high[-i]:
+            if self.data.high[-i-1] > self.data.high[-i]:
                 uptrend = False
                 break
         
@@ -700,4 +855,19 @@ CANDLESTICK_PATTERNS = {
     'evening_star': EveningStar,
     'three_white_soldiers': ThreeWhiteSoldiers,
     'three_black_crows': ThreeBlackCrows,
-}
\ No newline at end of file
+}
+
+# Vectorized masks by pattern name, for batch detection without a Cerebro run
+PATTERN_MASKS = {
+    'doji': _doji_mask,
+    'hammer': _hammer_mask,
+    'shooting_star': _shooting_star_mask,
+    'engulfing': _engulfing_mask,
+    'morning_star': _morning_star_mask,
+    'evening_star': _evening_star_mask,
+    'three_white_soldiers': _three_white_soldiers_mask,
+    'three_black_crows': _three_black_crows_mask,
+}
+
+# Pattern name of each registered class, for CandlestickPatternBase to find its mask
+_PATTERN_NAMES = {pattern_class: name for name, pattern_class in CANDLESTICK_PATTERNS.items()}
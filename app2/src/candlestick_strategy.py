@@ -1,8 +1,9 @@
 import backtrader as bt
-import numpy as np
+import math
 from candlestick_patterns import CANDLESTICK_PATTERNS
+from strategy import LogBuffer, cached_sma, cached_rsi, cached_macd, _PENDING, _FAILED
 
-class CandlestickPatternStrategy(bt.Strategy):
+class CandlestickPatternStrategy(LogBuffer, bt.Strategy):
     """
     A strategy that trades based on candlestick patterns.
     
@@ -15,6 +16,7 @@ class CandlestickPatternStrategy(bt.Strategy):
     - confirmation_indicator (str): Optional indicator for confirmation (None, 'sma', 'rsi', 'macd')
     - confirmation_params (dict): Parameters for the confirmation indicator
     - exit_on_opposite (bool): Whether to exit on opposite pattern detection
+    - short_allowed (bool): Whether bearish patterns may open short positions
     """
     params = dict(
         patterns=['engulfing'],  # Default pattern to look for
@@ -25,9 +27,11 @@ class CandlestickPatternStrategy(bt.Strategy):
         confirmation_indicator=None,   # 'sma', 'rsi', 'macd', etc.
         confirmation_params={},  # Parameters for the confirmation indicator
         exit_on_opposite=True,   # Exit on opposite pattern detection
+        short_allowed=False,     # Open shorts on bearish patterns
     )
     
     def __init__(self):
+        super().__init__()
         self.order = None
         self.entry_price = None
         self.stop_price = None
@@ -52,29 +56,18 @@ class CandlestickPatternStrategy(bt.Strategy):
         # Add confirmation indicator if specified
         self.confirmation = None
         if self.p.confirmation_indicator == 'sma':
-            self.sma_fast = bt.indicators.SMA(
-                self.data.close, 
-                period=self.p.confirmation_params.get('fast_period', 20)
-            )
-            self.sma_slow = bt.indicators.SMA(
-                self.data.close, 
-                period=self.p.confirmation_params.get('slow_period', 50)
-            )
+            self.sma_fast = cached_sma(self.data, self.p.confirmation_params.get('fast_period', 20))
+            self.sma_slow = cached_sma(self.data, self.p.confirmation_params.get('slow_period', 50))
             self.confirmation = self.sma_fast > self.sma_slow
         elif self.p.confirmation_indicator == 'rsi':
-            self.rsi = bt.indicators.RSI(
-                self.data.close,
-                period=self.p.confirmation_params.get('period', 14)
-            )
+            self.rsi = cached_rsi(self.data, self.p.confirmation_params.get('period', 14))
             self.oversold = self.p.confirmation_params.get('oversold', 30)
             self.overbought = self.p.confirmation_params.get('overbought', 70)
         elif self.p.confirmation_indicator == 'macd':
-            self.macd = bt.indicators.MACD(
-                self.data.close,
-                period_me1=self.p.confirmation_params.get('fast_period', 12),
-                period_me2=self.p.confirmation_params.get('slow_period', 26),
-                period_signal=self.p.confirmation_params.get('signal_period', 9)
-            )
+            self.macd = cached_macd(self.data,
+                                    self.p.confirmation_params.get('fast_period', 12),
+                                    self.p.confirmation_params.get('slow_period', 26),
+                                    self.p.confirmation_params.get('signal_period', 9))
         
         # Variables to track consecutive pattern detections
         self.bullish_count = {}
@@ -90,7 +83,7 @@ class CandlestickPatternStrategy(bt.Strategy):
         # Update pattern detection counts
         for pattern_name, pattern in self.patterns.items():
             # Check for a non-NaN pattern detection
-            if not np.isnan(pattern.lines.pattern[0]):
+            if not math.isnan(pattern.lines.pattern[0]):
                 # Determine if bullish or bearish
                 if pattern_name in self.bullish_patterns and pattern_name not in self.bearish_patterns:
                     self.bullish_count[pattern_name] += 1
@@ -158,28 +151,29 @@ class CandlestickPatternStrategy(bt.Strategy):
             if bullish_trigger:
                 self.order = self.buy()
                 self.entry_price = self.data.close[0]
-                self.stop_price = self.entry_price * (1 - self.p.stop_loss)
-                self.target_price = self.entry_price * (1 + self.p.take_profit)
+                self.target_price, self.stop_price = self._exit_levels(self.entry_price, self.p.stop_loss,
+                                                                       self.p.take_profit)
                 self.log(f"BUY SIGNAL ({triggered_pattern}), Price: {self.entry_price:.2f}, Stop: {self.stop_price:.2f}, Target: {self.target_price:.2f}")
             
             elif bearish_trigger and self.p.short_allowed:
                 self.order = self.sell()
                 self.entry_price = self.data.close[0]
-                self.stop_price = self.entry_price * (1 + self.p.stop_loss)
-                self.target_price = self.entry_price * (1 - self.p.take_profit)
+                self.target_price, self.stop_price = self._exit_levels(self.entry_price, self.p.stop_loss,
+                                                                       self.p.take_profit, is_long=False)
                 self.log(f"SELL SIGNAL ({triggered_pattern}), Price: {self.entry_price:.2f}, Stop: {self.stop_price:.2f}, Target: {self.target_price:.2f}")
         
         else:
             # Have an open position, look to exit
             if self.position.size > 0:  # Long position
                 # Check for take profit or stop loss
-                if self.data.close[0] >= self.target_price:
+                exit_reason = self._exit_reason(self.data.close[0], self.target_price, self.stop_price)
+                if exit_reason == 'target':
                     self.order = self.close()
                     self.log(f"CLOSE LONG (TAKE PROFIT), Price: {self.data.close[0]:.2f}")
                     self.num_trades += 1
                     self.num_profitable_trades += 1
                 
-                elif self.data.close[0] <= self.stop_price:
+                elif exit_reason == 'stop':
                     self.order = self.close()
                     self.log(f"CLOSE LONG (STOP LOSS), Price: {self.data.close[0]:.2f}")
                     self.num_trades += 1
@@ -194,13 +188,15 @@ class CandlestickPatternStrategy(bt.Strategy):
             
             elif self.position.size < 0 and self.p.short_allowed:  # Short position
                 # Check for take profit or stop loss
-                if self.data.close[0] <= self.target_price:
+                exit_reason = self._exit_reason(self.data.close[0], self.target_price, self.stop_price,
+                                                is_long=False)
+                if exit_reason == 'target':
                     self.order = self.close()
                     self.log(f"CLOSE SHORT (TAKE PROFIT), Price: {self.data.close[0]:.2f}")
                     self.num_trades += 1
                     self.num_profitable_trades += 1
                 
-                elif self.data.close[0] >= self.stop_price:
+                elif exit_reason == 'stop':
                     self.order = self.close()
                     self.log(f"CLOSE SHORT (STOP LOSS), Price: {self.data.close[0]:.2f}")
                     self.num_trades += 1
@@ -213,6 +209,40 @@ class CandlestickPatternStrategy(bt.Strategy):
                     if self.data.close[0] < self.entry_price:
                         self.num_profitable_trades += 1
     
+    @staticmethod
+    def _check_exits(entry_price, current_price, stop_loss, take_profit, is_long=True):
+        """
+        Decide whether an open position hits its take profit or stop loss.
+        
+        Returns 'target', 'stop', or None if the position should stay open. Prices are
+        compared against entry_price * (1 +/- take_profit / stop_loss), mirrored for shorts.
+        """
+        target_price, stop_price = CandlestickPatternStrategy._exit_levels(entry_price, stop_loss,
+                                                                           take_profit, is_long)
+        return CandlestickPatternStrategy._exit_reason(current_price, target_price, stop_price, is_long)
+    
+    @staticmethod
+    def _exit_levels(entry_price, stop_loss, take_profit, is_long=True):
+        """Return the (target, stop) prices of a position; computed once per entry, not per bar"""
+        if is_long:
+            return entry_price * (1 + take_profit), entry_price * (1 - stop_loss)
+        return entry_price * (1 - take_profit), entry_price * (1 + stop_loss)
+    
+    @staticmethod
+    def _exit_reason(current_price, target_price, stop_price, is_long=True):
+        """Return 'target', 'stop', or None for a price against the levels from _exit_levels"""
+        if is_long:
+            if current_price >= target_price:
+                return 'target'
+            if current_price <= stop_price:
+                return 'stop'
+        else:
+            if current_price <= target_price:
+                return 'target'
+            if current_price >= stop_price:
+                return 'stop'
+        return None
+    
     def _is_bullish_pattern(self, pattern_name):
         """Determine if the pattern instance is bullish"""
         if pattern_name == 'engulfing':
@@ -230,23 +260,23 @@ class CandlestickPatternStrategy(bt.Strategy):
         return False
     
     def notify_order(self, order):
-        if order.status in [order.Submitted, order.Accepted]:
+        if order.status in _PENDING:
             return
         
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.log(f"BUY EXECUTED, Price: {order.executed.price:.2f}")
             elif order.issell():
                 self.log(f"SELL EXECUTED, Price: {order.executed.price:.2f}")
         
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
+        elif order.status in _FAILED:
             self.log("Order Canceled/Margin/Rejected")
         
         self.order = None
     
     def log(self, txt, dt=None):
         dt = dt or self.data.datetime.datetime(0)
-        print(f"{dt.isoformat()} {txt}")
+        self.buffer_log(f"{dt.isoformat()} {txt}\n")
     
     def stop(self):
         # Log the strategy results
@@ -0,0 +1,178 @@
+import numpy as np
+
+import indicator_cache
+
+
+EXIT_SIGNAL, EXIT_TAKE_PROFIT, EXIT_STOP_LOSS = 0, 1, 2
+
+
+def _as_prices(values):
+    """Return ``values`` as a float array, keeping float32 input as float32 instead of upcasting"""
+    values = np.asarray(values)
+    return values if values.dtype in (np.float32, np.float64) else values.astype(np.float64)
+
+
+def _first_exit(opens, closes, sell, k, take_profit, stop_loss):
+    """Index of the first bar from ``k`` on where a position filled at ``opens[k]`` exits, and why"""
+    n = closes.size
+    entry_price = opens[k]
+    tp_price = entry_price * (1 + take_profit)
+    sl_price = entry_price * (1 - stop_loss) if stop_loss is not None else None
+    # Scan growing windows, so a short trade doesn't pay for comparing the rest of the series
+    width = 64
+    while k < n:
+        seg = closes[k:k + width]
+        tp_hit = seg >= tp_price if take_profit > 0 else np.zeros(seg.size, dtype=bool)
+        sl_hit = seg < sl_price if sl_price is not None else np.zeros(seg.size, dtype=bool)
+        hit = np.flatnonzero(tp_hit | sl_hit | sell[k:k + width])
+        if hit.size:
+            j = hit[0]
+            # Same precedence as the strategies' exit ladder: take profit, stop loss, then the signal
+            reason = EXIT_TAKE_PROFIT if tp_hit[j] else EXIT_STOP_LOSS if sl_hit[j] else EXIT_SIGNAL
+            return k + j, reason
+        k += width
+        width *= 2
+    return None, None
+
+
+def scan_exits(opens, closes, buy, sell, take_profit=0.0, stop_loss=None):
+    """
+    Walk the trades a long-only strategy takes from precomputed ``buy``/``sell`` signal masks.
+
+    Orders behave like Backtrader market orders: a signal on bar ``i`` fills at ``opens[i + 1]``,
+    and the next signal can come on the fill bar itself. While in a position, each bar's close
+    is checked against the take-profit and stop-loss levels around the fill price, then against
+    ``sell``. A take profit of 0 is disabled; a stop loss of 0 exits on any close below the
+    fill price, like the strategies' stops, and None disables it. Only one vectorized search
+    per trade runs in Python, and with neither level set that search is a binary search over
+    the sell bars, so the idle bars between signals are never visited.
+
+    Returns ``(entries, exits, reasons)``: the signal bars of each entry and exit, and
+    ``EXIT_SIGNAL``/``EXIT_TAKE_PROFIT``/``EXIT_STOP_LOSS`` per exit. An entry still open at
+    the end has no exit, and an exit signalled on the last bar never fills.
+
+    float32 prices are scanned as float32, halving the memory each comparison streams
+    through on long minute-bar series; the levels are then compared at float32 precision.
+    """
+    opens = _as_prices(opens)
+    closes = _as_prices(closes)
+    buy = np.asarray(buy, dtype=bool)
+    sell = np.asarray(sell, dtype=bool)
+    n = closes.size
+
+    entries, exits, reasons = [], [], []
+    buy_bars = np.flatnonzero(buy[:n - 1])  # A buy on the last bar never fills
+    sell_bars = np.flatnonzero(sell) if take_profit <= 0 and stop_loss is None else None
+    i = 0
+    while True:
+        pos = np.searchsorted(buy_bars, i)
+        if pos == buy_bars.size:
+            break
+        entry = buy_bars[pos]
+        if sell_bars is None:
+            exit_bar, reason = _first_exit(opens, closes, sell, entry + 1, take_profit, stop_loss)
+        else:
+            # Signal exits only: the first sell bar from the fill on
+            pos = np.searchsorted(sell_bars, entry + 1)
+            exit_bar, reason = (sell_bars[pos], EXIT_SIGNAL) if pos < sell_bars.size else (None, None)
+        entries.append(entry)
+        if exit_bar is None:
+            break
+        exits.append(exit_bar)
+        reasons.append(reason)
+        i = exit_bar + 1  # Flat again once the exit fills
+    return np.array(entries, dtype=np.intp), np.array(exits, dtype=np.intp), np.array(reasons, dtype=np.int8)
+
+
+def run_vectorized(opens, closes, entries, exits, cash=10000.0, commission=0.0, percent=None):
+    """
+    Broker value at every bar's close from trading the ``entries``/``exits`` of ``scan_exits``
+    the way Cerebro would: market orders fill at the next open and ``commission`` is a fraction
+    of the traded value (``broker.setcommission``). Each position is 1 share, Backtrader's
+    default stake, or with ``percent`` that percentage of the cash at the entry bar's close,
+    like ``bt.sizers.PercentSizer``.
+
+    Only the per-trade sizing runs in Python; holdings and cash are cumulative sums of the
+    changes at each fill bar, so the curve itself is built in a couple of NumPy passes.
+    Prices are always valued in float64, even when given as float32, so the cash and
+    holdings sums don't accumulate float32 rounding over long runs.
+    """
+    opens = np.asarray(opens, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    n = closes.size
+
+    size_change = np.zeros(n)
+    cash_change = np.zeros(n)
+    cash_now = cash
+    for k, entry in enumerate(entries):
+        fill = entry + 1
+        size = 1.0 if percent is None else cash_now / closes[entry] * (percent / 100)
+        cost = size * opens[fill]
+        cash_now -= cost + cost * commission
+        size_change[fill] += size
+        cash_change[fill] -= cost + cost * commission
+        if k < len(exits) and exits[k] + 1 < n:
+            exit_fill = exits[k] + 1
+            proceeds = size * opens[exit_fill]
+            cash_now += proceeds - proceeds * commission
+            size_change[exit_fill] -= size
+            cash_change[exit_fill] += proceeds - proceeds * commission
+
+    return cash + np.cumsum(cash_change) + np.cumsum(size_change) * closes
+
+
+def sma_cross_backtest(opens, closes, sma_fast_period, sma_slow_period, cash=10000.0,
+                       commission=0.0, percent=None, key=None):
+    """
+    Replay ``strategy.SmaCross`` without running Cerebro. By default this matches Backtrader's
+    defaults (1-share stakes, no commission); ``commission`` and ``percent`` mirror
+    ``broker.setcommission`` and ``bt.sizers.PercentSizer`` as used by ``main.py``.
+
+    The crossover signal is computed once for the whole series, the trades are walked with
+    ``scan_exits`` and valued with ``run_vectorized``. Returns the same figures the sweep
+    tests read from a Cerebro run: ``final_value`` (broker value), ``trades`` (TradeAnalyzer
+    total, open trade included) and the strategy's own ``num_trades`` /
+    ``num_profitable_trades`` counters. float32 prices are scanned as float32, see ``scan_exits``.
+    ``key`` is the indicator_cache key of ``closes`` (see ``indicator_cache.get_sma``).
+    """
+    opens = _as_prices(opens)
+    closes = _as_prices(closes)
+
+    fast = indicator_cache.get_sma(closes, sma_fast_period, key)
+    slow = indicator_cache.get_sma(closes, sma_slow_period, key)
+    cross = indicator_cache.crossover(fast, slow, max(sma_fast_period, sma_slow_period) - 1)
+    entries, exits, _ = scan_exits(opens, closes, cross > 0, cross < 0)
+    equity = run_vectorized(opens, closes, entries, exits, cash, commission, percent)
+
+    # SmaCross counts a trade when it signals the exit, even if the close never fills, and
+    # judges it against the close on the entry signal bar
+    return {
+        'final_value': float(equity[-1]),
+        'trades': int(entries.size),
+        'num_trades': int(exits.size),
+        'num_profitable_trades': int((closes[exits] > closes[entries[:exits.size]]).sum())
+    }
+
+
+def rsi_macd_backtest(opens, closes, rsi_period=14, rsi_oversold=30, rsi_overbought=70, macd_fast=12,
+                      macd_slow=26, macd_signal=9, stop_loss=0.05, take_profit=0.0, cash=10000.0,
+                      commission=0.0, percent=None, key=None):
+    """
+    Replay ``strategy.RsiMacdStrategy`` without running Cerebro, like ``sma_cross_backtest``;
+    the defaults are the strategy's. Entries are bars where RSI is below ``rsi_oversold`` with
+    MACD above its signal, exits the stop loss / take profit around the fill price or RSI above
+    ``rsi_overbought`` / MACD below its signal, all as whole-series masks walked by
+    ``scan_exits``. Returns ``final_value`` (broker value) and ``trades`` (TradeAnalyzer total,
+    open trade included). ``key`` is passed on to indicator_cache like in ``sma_cross_backtest``.
+    """
+    opens = _as_prices(opens)
+    closes = _as_prices(closes)
+
+    # Bars before RSI or MACD are valid are NaN, and NaN compares False, so they never signal
+    rsi = indicator_cache.get_rsi(closes, rsi_period, key)
+    macd, signal = indicator_cache.get_macd(closes, macd_fast, macd_slow, macd_signal, key)
+    buy = (rsi < float(rsi_oversold)) & (macd > signal)
+    sell = (rsi > float(rsi_overbought)) | (macd < signal)
+    entries, exits, _ = scan_exits(opens, closes, buy, sell, take_profit, stop_loss)
+    equity = run_vectorized(opens, closes, entries, exits, cash, commission, percent)
+    return {'final_value': float(equity[-1]), 'trades': int(entries.size)}
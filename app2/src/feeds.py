@@ -0,0 +1,43 @@
+import numpy as np
+import backtrader as bt
+from backtrader.utils import date2num
+
+
+class ArrayData(bt.feeds.PandasData):
+    """
+    ``bt.feeds.PandasData`` that reads the DataFrame column by column once, when the feed
+    starts, instead of one ``iloc[row, column]`` lookup per field on every bar.
+
+    Each mapped column is stored as a contiguous float64 series and the index as
+    Backtrader's float datetimes, so loading a bar is a handful of list reads. Takes the
+    same parameters and produces the same lines as ``PandasData``.
+    """
+
+    def start(self):
+        super(ArrayData, self).start()
+
+        df = self.p.dataname
+        self._columns = []
+        for datafield in self.getlinealiases():
+            if datafield == 'datetime':
+                continue
+            colindex = self._colmapping[datafield]
+            if colindex is None:
+                continue  # Missing in the DataFrame
+            values = df.iloc[:, colindex].to_numpy(dtype=np.float64)
+            self._columns.append((getattr(self.lines, datafield), values.tolist()))
+
+        coldtime = self._colmapping['datetime']
+        timestamps = df.index if coldtime is None else df.iloc[:, coldtime]
+        self._dtnums = [date2num(tstamp.to_pydatetime()) for tstamp in timestamps]
+
+    def _load(self):
+        self._idx += 1
+
+        if self._idx >= len(self._dtnums):
+            return False
+
+        for line, values in self._columns:
+            line[0] = values[self._idx]
+        self.lines.datetime[0] = self._dtnums[self._idx]
+        return True
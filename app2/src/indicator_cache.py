@@ -0,0 +1,305 @@
+import hashlib
+import math
+import numpy as np
+from functools import lru_cache
+
+
+def _as_closes(closes):
+    """Return the close series as a contiguous float64 array"""
+    return np.ascontiguousarray(closes, dtype=np.float64)
+
+
+def series_key(*series):
+    """
+    Digest of the content of one or more series, usable as the ``key`` of the ``get_*``
+    functions. It copies and hashes every value, so work it out once per feed and pass it
+    to each lookup instead of leaving every lookup to do it again.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for values in series:
+        digest.update(_as_closes(values).tobytes())
+    return digest.digest()
+
+
+class _Keyed:
+    """Series handed to the memoized functions; hashed and compared by its key alone"""
+    __slots__ = ('values', 'key')
+
+    def __init__(self, values, key):
+        self.values = values
+        self.key = key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def _keyed(values, key):
+    """Wrap ``values`` for the memoized functions, keyed on their digest when ``key`` is None"""
+    values = _as_closes(values)
+    return _Keyed(values, series_key(values) if key is None else key)
+
+
+class WindowSum:
+    """
+    Exact sum of a sliding window, kept as Shewchuk's list of non-overlapping partials (the
+    same expansion ``math.fsum`` builds). Adding or removing a value touches only those few
+    partials, and ``value()`` is the correctly rounded total, equal to ``math.fsum`` of the
+    window as bt's SMA computes it, so sliding the window never drifts.
+    """
+    __slots__ = ('partials',)
+
+    def __init__(self, values):
+        self.partials = []
+        for x in values:
+            self._add(x)
+
+    def _add(self, x):
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def slide(self, new, old):
+        """Add ``new`` to the window and drop ``old`` from it"""
+        self._add(new)
+        self._add(-old)
+
+    def value(self):
+        return math.fsum(self.partials)
+
+
+def _window_sums(values, period):
+    """``math.fsum`` of every ``period``-long window of the list ``values``, in O(1) per window"""
+    window = WindowSum(values[:period])
+    sums = [window.value()]
+    for new, old in zip(values[period:], values):
+        window.slide(new, old)
+        sums.append(window.value())
+    return sums
+
+
+@lru_cache(maxsize=256)
+def _sma(series, period):
+    closes = series.values
+    out = np.full(closes.size, np.nan)
+    if 0 < period <= closes.size:
+        # Exact window sums, like bt's fsum-based SMA, so ties (e.g. flat stretches) compare
+        # equal to the price bar for bar instead of being off by a rounding error
+        out[period - 1:] = _window_sums(closes.tolist(), period)
+        out[period - 1:] /= period
+    out.setflags(write=False)  # Shared between callers, never mutate
+    return out
+
+
+def get_sma(closes: np.ndarray, period: int, key=None) -> np.ndarray:
+    """
+    Simple moving average of a close series, memoized on (key, period).
+
+    ``key`` is any hashable that names the content of ``closes``, e.g. a ``series_key``
+    digest or a (ticker, timeframe, start, end) tuple, and must change whenever the content
+    does; left as None it is the series' digest, worked out again on every call.
+
+    The result has the same length as ``closes`` so index ``i`` lines up with bar ``i``;
+    the first ``period - 1`` values are NaN. Parameter sweeps over the same ticker/date
+    range hit the cache instead of recomputing the same windowed sums for every run.
+    """
+    return _sma(_keyed(closes, key), int(period))
+
+
+@lru_cache(maxsize=256)
+def _bollinger(series, period, devfactor):
+    closes = series.values
+    mid = _sma(series, period)
+    top, bot = np.full(closes.size, np.nan), np.full(closes.size, np.nan)
+    if 0 < period <= closes.size:
+        # Population std as mean of squares minus square of mean, with Python's ** like
+        # bt.indicators.StdDev (C pow rounds differently from NumPy's x * x and sqrt)
+        means = mid[period - 1:].tolist()
+        meansq = _window_sums([x ** 2 for x in closes.tolist()], period)
+        devs = [devfactor * abs(sq / period - m ** 2) ** 0.5 for sq, m in zip(meansq, means)]
+        top[period - 1:] = [m + d for m, d in zip(means, devs)]
+        bot[period - 1:] = [m - d for m, d in zip(means, devs)]
+    for band in (top, bot):
+        band.setflags(write=False)
+    return mid, top, bot
+
+
+def get_bollinger(closes: np.ndarray, period: int, devfactor: float, key=None):
+    """
+    Bollinger Bands ``(mid, top, bot)`` of a close series, memoized like ``get_sma``.
+
+    Matches ``bt.indicators.BollingerBands``: ``mid`` is the SMA and the bands are
+    ``devfactor`` population standard deviations away; the first ``period - 1`` values are NaN.
+    """
+    return _bollinger(_keyed(closes, key), int(period), float(devfactor))
+
+
+@lru_cache(maxsize=256)
+def _rsi(series, period):
+    closes = series.values.tolist()
+    out = np.full(len(closes), np.nan)
+    if 0 < period < len(closes):
+        # Wilder smoothing of the up and down moves, seeded with their plain mean, like bt's RSI
+        changes = [b - a for a, b in zip(closes, closes[1:])]
+        alpha = 1.0 / period
+        alpha1 = 1.0 - alpha
+        up = math.fsum(max(c, 0.0) for c in changes[:period]) / period
+        down = math.fsum(max(-c, 0.0) for c in changes[:period]) / period
+        values = [100.0 - 100.0 / (1.0 + up / down)]
+        for c in changes[period:]:
+            up = up * alpha1 + max(c, 0.0) * alpha
+            down = down * alpha1 + max(-c, 0.0) * alpha
+            values.append(100.0 - 100.0 / (1.0 + up / down))
+        out[period:] = values
+    out.setflags(write=False)
+    return out
+
+
+def get_rsi(closes: np.ndarray, period: int, key=None) -> np.ndarray:
+    """
+    Wilder RSI of a close series, memoized like ``get_sma``.
+
+    Matches ``bt.indicators.RSI`` bar for bar, including raising ZeroDivisionError when a
+    window has no down moves; the first ``period`` values are NaN.
+    """
+    return _rsi(_keyed(closes, key), int(period))
+
+
+def ema(values, period, start=0):
+    """bt's EMA of the list ``values``, whose first valid element is at index ``start``"""
+    out = [math.nan] * len(values)
+    first = start + period - 1
+    if first >= len(values):
+        return out
+    # Seeded with the plain mean of the first period values, then smoothed bar by bar
+    alpha = 2.0 / (1.0 + period)
+    alpha1 = 1.0 - alpha
+    prev = out[first] = math.fsum(values[start:first + 1]) / period
+    for i in range(first + 1, len(values)):
+        prev = out[i] = prev * alpha1 + values[i] * alpha
+    return out
+
+
+@lru_cache(maxsize=256)
+def _macd(series, fast, slow, signal):
+    closes = series.values.tolist()
+    start = max(fast, slow) - 1
+    macd = [a - b for a, b in zip(ema(closes, fast, 0), ema(closes, slow, 0))]
+    lines = (np.array(macd), np.array(ema(macd, signal, start)))
+    for line in lines:
+        line.setflags(write=False)
+    return lines
+
+
+def get_macd(closes: np.ndarray, fast: int, slow: int, signal: int, key=None):
+    """
+    MACD ``(macd, signal)`` lines of a close series, memoized like ``get_sma``.
+
+    Matches ``bt.indicators.MACD``: ``macd`` is the fast EMA minus the slow EMA and
+    ``signal`` is the EMA of ``macd``, each EMA seeded with a plain mean; values before the
+    lines are valid are NaN.
+    """
+    return _macd(_keyed(closes, key), int(fast), int(slow), int(signal))
+
+
+@lru_cache(maxsize=256)
+def _atr(bars, period):
+    highs, lows, closes = (values.tolist() for values in bars.values)
+    out = np.full(len(closes), np.nan)
+    if 0 < period < len(closes):
+        # True range against the previous close, Wilder-smoothed from its plain mean like bt's ATR
+        ranges = [max(h, c) - min(l, c) for h, l, c in zip(highs[1:], lows[1:], closes)]
+        alpha = 1.0 / period
+        alpha1 = 1.0 - alpha
+        prev = math.fsum(ranges[:period]) / period
+        values = [prev]
+        for tr in ranges[period:]:
+            prev = prev * alpha1 + tr * alpha
+            values.append(prev)
+        out[period:] = values
+    out.setflags(write=False)
+    return out
+
+
+def get_atr(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int, key=None) -> np.ndarray:
+    """
+    Average true range of a bar series, memoized like ``get_sma``; ``key`` names all three
+    series together.
+
+    Matches ``bt.indicators.ATR`` bar for bar; the first ``period`` values are NaN.
+    """
+    bars = tuple(_as_closes(values) for values in (highs, lows, closes))
+    return _atr(_Keyed(bars, series_key(*bars) if key is None else key), int(period))
+
+
+@lru_cache(maxsize=64)
+def _percentile(series, window, q):
+    values = series.values
+    out = np.full(values.size, np.nan)
+    if 0 < window <= values.size:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        # np.percentile partitions a copy of its input, so go in blocks of rows to keep
+        # that copy small on long minute-bar series
+        rows = max(1, (1 << 20) // window)
+        for lo in range(0, len(windows), rows):
+            out[window - 1 + lo:window - 1 + lo + rows] = np.percentile(windows[lo:lo + rows], q, axis=1)
+    out.setflags(write=False)
+    return out
+
+
+def get_rolling_percentile(values: np.ndarray, window: int, q: float, key=None) -> np.ndarray:
+    """
+    ``q``-th percentile of each trailing ``window`` of ``values``, memoized like ``get_sma``.
+
+    Index ``i`` is ``np.percentile(values[i - window + 1:i + 1], q)``, computed for every
+    window at once over a strided view instead of once per bar; the first ``window - 1``
+    values are NaN.
+    """
+    return _percentile(_keyed(values, key), int(window), float(q))
+
+
+def crossover(a, b, start):
+    """
+    +1 where ``a`` crosses above ``b``, -1 where it crosses below, else 0.
+
+    Matches ``bt.indicators.CrossOver``: the previous difference is the last non-zero
+    ``a - b`` (seeded at ``start``, the first bar where both inputs are valid), so touching
+    without crossing is not a signal. Bars up to and including ``start`` are always 0.
+    """
+    diff = a - b
+    n = diff.size
+    cross = np.zeros(n, dtype=np.int8)
+    if start + 1 >= n:
+        return cross
+
+    # Index of the last non-zero difference at or before each bar, the seed bar always counts
+    idx = np.arange(n)
+    keep = diff != 0
+    keep[start] = True
+    last_nz = np.maximum.accumulate(np.where(keep[start:], idx[start:], start))
+    prev = diff[last_nz[:-1]]
+    cur = diff[start + 1:]
+
+    cross[start + 1:] = np.where((prev < 0) & (cur > 0), 1, np.where((prev > 0) & (cur < 0), -1, 0))
+    return cross
+
+
+def clear_cache():
+    """Drop all memoized indicator arrays"""
+    _sma.cache_clear()
+    _bollinger.cache_clear()
+    _rsi.cache_clear()
+    _macd.cache_clear()
+    _atr.cache_clear()
+    _percentile.cache_clear()
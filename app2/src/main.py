@@ -1,11 +1,11 @@
 import os
 import argparse
 import datetime
-import backtrader as bt
 from dotenv import load_dotenv
-import pandas as pd
-import alpaca_trade_api as tradeapi
 import importlib
+import functools
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 # Plotly imports commented out since we're using Backtrader's built-in charting
 # import plotly.graph_objs as go
@@ -23,27 +23,42 @@ ALPACA_API_SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
 ALPACA_API_URL = os.getenv('APCA_API_BASE_URL', 'https://paper-api.alpaca.markets/v2')
 ALPACA_PAPER = os.getenv('ALPACA_PAPER', 'True')
 
+# Tickers downloaded at once; more parallel requests only run into Alpaca's rate limit
+MAX_CONCURRENT_FETCHES = 5
+
 print("ALPACA_API_KEY (APCA_API_KEY_ID):", ALPACA_API_KEY)
 print("ALPACA_API_SECRET_KEY:", ALPACA_API_SECRET_KEY)
 print("ALPACA_API_URL (APCA_API_BASE_URL):", ALPACA_API_URL)
 print("ALPACA_PAPER:", ALPACA_PAPER)
 
 # ---------------------------------------------
-#          IMPORT CUSTOM STRATEGIES
+#               CUSTOM STRATEGIES
 # ---------------------------------------------
-from strategy import SmaCross, BollingerBreakoutStrategy, RsiMacdStrategy, TestStrat1, HighVolPivotsStrategy, MarketStructureStrategy, CustomBuySell
+# Class names in strategy.py. pandas, NumPy, Backtrader, the strategies and the Alpaca client
+# are only imported where they are used, so --help doesn't pay for any of them and the
+# vectorized engine skips Backtrader.
+STRATEGIES = {
+    'sma': 'SmaCross',
+    'bbbreak': 'BollingerBreakoutStrategy',
+    'rsimacd': 'RsiMacdStrategy',
+    'teststrat1': 'TestStrat1',
+    'volpivots': 'HighVolPivotsStrategy',
+    'marketstructure': 'MarketStructureStrategy'
+}
 
 # ---------------------------------------------
 #           HELPER FUNCTIONS
 # ---------------------------------------------
+@functools.lru_cache(maxsize=1)
 def get_alpaca_api():
-    api = tradeapi.REST(
+    """Shared Alpaca REST client, so every download in the process reuses one keep-alive HTTP session"""
+    import alpaca_trade_api as tradeapi
+    return tradeapi.REST(
         key_id=ALPACA_API_KEY,
         secret_key=ALPACA_API_SECRET_KEY,
         base_url=ALPACA_API_URL,
         api_version='v2'
     )
-    return api
 
 def chunk_date_range(start_date, end_date, chunk_size_days=30):
     current_start = start_date
@@ -53,6 +68,13 @@ def chunk_date_range(start_date, end_date, chunk_size_days=30):
         current_start = current_end + datetime.timedelta(days=1)
 
 def fetch_bars_in_chunks(api, symbol, timeframe_str, start_str, end_str):
+    """
+    Download the bars of ``symbol`` in 30-day chunks. ``symbol`` may also be a list of
+    tickers, downloaded with one request per chunk; their bars come back in one frame,
+    told apart by Alpaca's 'symbol' column.
+    """
+    import pandas as pd
+
     start_date = pd.to_datetime(start_str)
     end_date = pd.to_datetime(end_str)
     all_bars = []
@@ -68,7 +90,7 @@ def fetch_bars_in_chunks(api, symbol, timeframe_str, start_str, end_str):
                 adjustment='all'
             ).df
             if not bars_chunk.empty:
-                if 'symbol' in bars_chunk.columns:
+                if isinstance(symbol, str) and 'symbol' in bars_chunk.columns:
                     bars_chunk = bars_chunk[bars_chunk['symbol'] == symbol]
                 all_bars.append(bars_chunk)
         except Exception as e:
@@ -101,6 +123,8 @@ def convert_timeframe(tf_str):
         raise ValueError("Unsupported timeframe: " + tf_str)
 
 def log_results(strategy_name, num_trades, num_profitable_trades, pct_change, underlying_growth, final_value, params):
+    import pandas as pd
+
     # Create the Results directory if it doesn't exist
     results_dir = 'Results'
     if not os.path.exists(results_dir):
@@ -126,18 +150,65 @@ def log_results(strategy_name, num_trades, num_profitable_trades, pct_change, un
     else:
         results_df.to_csv(filename, index=False)  # Create new file with header
 
+def save_plot(cerebro, filename):
+    """Render the Backtrader chart off-screen with the Agg backend and write it to filename"""
+    import matplotlib
+    matplotlib.use('Agg')  # No GUI window or event loop, so this also works in worker processes
+    import matplotlib.pyplot as plt
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    # Merge line segments that are within a pixel of each other when drawing, which on long
+    # minute-bar runs skips most of the indicator line vertices
+    with plt.rc_context({'path.simplify': True, 'path.simplify_threshold': 1.0}):
+        figure = cerebro.plot(style='candle', volume=False, iplot=False)[0][0]
+        figure.savefig(filename)
+    plt.close(figure)
+
 # ---------------------------------------------
 #                  MAIN LOGIC
 # ---------------------------------------------
-def main(args):
-    api = get_alpaca_api()
-    validate_symbol_is_tradable(api, args.ticker)
+def prefetch_bars(api, args, tickers):
+    """
+    Download the bars of tickers that miss the same days in the bar cache together, one
+    multi-symbol request per chunk instead of one per ticker. Returns each ticker's bars
+    keyed by (ticker, start, end) for load_bars to hand to the cache.
+    """
+    from bars_cache import missing_range
+
     alpaca_timeframe = convert_timeframe(args.timeframe)
-    data_df = fetch_bars_in_chunks(api, args.ticker, alpaca_timeframe, args.start, args.end)
-    
-    if data_df.empty:
-        print("No data returned from Alpaca for the specified parameters.")
-        return
+    groups = collections.defaultdict(list)
+    for ticker in tickers:
+        days = missing_range(ticker, args.start, args.end, alpaca_timeframe, use_cache=not args.no_cache)
+        if days is not None:
+            groups[days].append(ticker)
+
+    prefetched = {}
+    for (start, end), group in groups.items():
+        if len(group) < 2:
+            continue  # Nothing to share, load_bars downloads it on its own
+        bars = fetch_bars_in_chunks(api, group, alpaca_timeframe, start, end)
+        for ticker in group:
+            prefetched[(ticker, start, end)] = bars[bars['symbol'] == ticker] if not bars.empty else bars
+    return prefetched
+
+def load_bars(api, args, ticker, prefetched=None):
+    """Download (or read from the bar cache) the bars of one ticker, with Backtrader's column names"""
+    from bars_cache import cached_bars
+
+    validate_symbol_is_tradable(api, ticker)
+    alpaca_timeframe = convert_timeframe(args.timeframe)
+    prefetched = {} if prefetched is None else prefetched
+
+    def fetch(start, end):
+        # Bars prefetch_bars already downloaded for exactly this range, else a download of their own
+        bars = prefetched.pop((ticker, start, end), None)
+        return fetch_bars_in_chunks(api, ticker, alpaca_timeframe, start, end) if bars is None else bars
+
+    data_df = cached_bars(
+        fetch,
+        ticker, args.start, args.end, alpaca_timeframe,
+        use_cache=not args.no_cache
+    )
     
     data_df.rename(columns={
         'open': 'Open',
@@ -146,24 +217,29 @@ def main(args):
         'close': 'Close',
         'volume': 'Volume'
     }, inplace=True)
-    
-    print(f"Running backtest for {args.ticker} from {data_df.index[0]} to {data_df.index[-1]} using timeframe: {args.timeframe}")
-    data_feed = bt.feeds.PandasData(dataname=data_df)
-    cerebro = bt.Cerebro()
+    return data_df
+
+def run_backtest(args, ticker, data_df, plot=False):
+    """
+    Backtest args.strategy on one ticker's bars and return the log_results fields as
+    (num_trades, num_profitable_trades, pct_change, stock_growth, final_value, params),
+    or None for an unknown strategy. Runs in worker processes for multi-ticker runs.
+    """
+    print(f"Running backtest for {ticker} from {data_df.index[0]} to {data_df.index[-1]} using timeframe: {args.timeframe}")
 
     # Select strategy based on CLI argument.
     if args.strategy == 'sma':
-        cerebro.addstrategy(
-            SmaCross,
+        strategy_params = dict(
             sma_fast_period=args.sma_fast_period,
             sma_slow_period=args.sma_slow_period,
-            take_profit=args.sma_take_profit
+            take_profit=args.sma_take_profit,
+            verbose=args.verbose
         )
         params = {
             'sma_fast_period': args.sma_fast_period,
             'sma_slow_period': args.sma_slow_period,
             'take_profit': args.sma_take_profit,
-            'ticker': args.ticker,
+            'ticker': ticker,
             'start_date': args.start,
             'end_date': args.end,
             'timeframe': args.timeframe,
@@ -171,8 +247,7 @@ def main(args):
             'principal': args.principal
         }
     elif args.strategy == 'bbbreak':
-        cerebro.addstrategy(
-            BollingerBreakoutStrategy,
+        strategy_params = dict(
             period=args.bbbreak_bb_period,
             devfactor=args.bbbreak_bb_dev,
             stop_loss=args.bbbreak_stop_loss,
@@ -183,7 +258,7 @@ def main(args):
             'devfactor': args.bbbreak_bb_dev,
             'stop_loss': args.bbbreak_stop_loss,
             'take_profit': args.bbbreak_take_profit,
-            'ticker': args.ticker,
+            'ticker': ticker,
             'start_date': args.start,
             'end_date': args.end,
             'timeframe': args.timeframe,
@@ -194,52 +269,118 @@ def main(args):
         }
     else:
         print("Unknown strategy specified.")
-        return
-
-    cerebro.adddata(data_feed)
-    cerebro.broker.setcash(args.principal)
-    cerebro.broker.setcommission(commission=args.commission)
-    cerebro.addsizer(bt.sizers.PercentSizer, percents=args.percent)
-    cerebro.addobserver(CustomBuySell)
+        return None
 
     initial_value = args.principal
-    print(f"Starting Portfolio Value: {cerebro.broker.getvalue():.2f}")
-    
-    # Run the strategy and get the results
-    strategies = cerebro.run()
-    
-    # Ensure strategies is not empty
-    if not strategies:
-        print("No strategies were run.")
-        return
+    print(f"Starting Portfolio Value: {initial_value:.2f}")
+
+    if args.engine == 'vectorized':
+        import numpy as np
+        import fast_backtest
+
+        # Same trades and sizing as the Cerebro run below, replayed with NumPy instead of bar by bar
+        result = fast_backtest.sma_cross_backtest(
+            data_df['Open'].to_numpy(dtype=np.float64), data_df['Close'].to_numpy(dtype=np.float64),
+            args.sma_fast_period, args.sma_slow_period,
+            cash=args.principal, commission=args.commission, percent=args.percent
+        )
+        final_value = result['final_value']
+        num_trades = result['num_trades']
+        num_profitable_trades = result['num_profitable_trades']
+    else:
+        import backtrader as bt
+        import strategy
+        from feeds import ArrayData
+
+        cerebro = bt.Cerebro()
+        cerebro.addstrategy(getattr(strategy, STRATEGIES[args.strategy]), **strategy_params)
+        cerebro.adddata(ArrayData(dataname=data_df))
+        cerebro.broker.setcash(args.principal)
+        cerebro.broker.setcommission(commission=args.commission)
+        cerebro.addsizer(bt.sizers.PercentSizer, percents=args.percent)
+        cerebro.addobserver(strategy.CustomBuySell)
+
+        # Run the strategy and get the results
+        strategies = cerebro.run()
+
+        # Ensure strategies is not empty
+        if not strategies:
+            print("No strategies were run.")
+            return None
+
+        final_value = cerebro.broker.getvalue()
+
+        # Get the number of trades and profitable trades from the strategy
+        num_trades = strategies[0].num_trades
+        num_profitable_trades = strategies[0].num_profitable_trades
 
-    final_value = cerebro.broker.getvalue()
     pct_change = (final_value - initial_value) / initial_value * 100
     first_close = data_df['Close'].iloc[0]
     last_close = data_df['Close'].iloc[-1]
     stock_growth = (last_close - first_close) / first_close * 100
 
-    # Get the number of trades and profitable trades from the strategy
-    num_trades = strategies[0].num_trades
-    num_profitable_trades = strategies[0].num_profitable_trades
+    # Plotting pulls in matplotlib and blocks on the GUI window, so it is opt-in for batch runs
+    if args.engine == 'backtrader':
+        if args.save_plot:
+            save_plot(cerebro, os.path.join('Results', f"{args.strategy}_{ticker}.png"))
+        elif plot:
+            cerebro.plot(style='candle', volume=False)
 
-    # Log results to CSV
-    log_results(args.strategy, num_trades, num_profitable_trades, pct_change, stock_growth, final_value, params)
+    return num_trades, num_profitable_trades, pct_change, stock_growth, final_value, params
+
+def main(args):
+    tickers = [t.strip() for t in args.tickers.split(',')] if args.tickers else [args.ticker]
+
+    if args.engine == 'vectorized' and args.strategy != 'sma':
+        print("The vectorized engine only supports the sma strategy.")
+        return
+
+    # Downloads are network-bound, so fetch the tickers' bars concurrently on threads, after
+    # batching the ones that need the same days into shared multi-symbol requests
+    api = get_alpaca_api()
+    prefetched = prefetch_bars(api, args, tickers) if len(tickers) > 1 else {}
+    with ThreadPoolExecutor(max_workers=min(len(tickers), MAX_CONCURRENT_FETCHES)) as pool:
+        bars = dict(zip(tickers, pool.map(lambda ticker: load_bars(api, args, ticker, prefetched), tickers)))
+
+    for ticker in tickers:
+        if bars[ticker].empty:
+            print(f"No data returned from Alpaca for {ticker} with the specified parameters.")
+            del bars[ticker]
+
+    if len(bars) == 1:
+        [(ticker, data_df)] = bars.items()
+        results = [run_backtest(args, ticker, data_df, plot=args.plot)]
+    else:
+        # Backtests are CPU-bound and independent, so run one per process; workers never open
+        # a chart window, though they can still save one with --save-plot
+        if args.plot and not args.save_plot:
+            print("Plotting is skipped when backtesting several tickers; use --save-plot to save the charts.")
+        results = []
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            futures = {pool.submit(run_backtest, args, ticker, data_df): ticker for ticker, data_df in bars.items()}
+            for done, future in enumerate(as_completed(futures), start=1):
+                print(f"Finished backtest {done}/{len(futures)}: {futures[future]}")
+                results.append(future.result())
+
+    # Log results to CSV from this process only, so rows from parallel runs never interleave
+    for result in results:
+        if result is not None:
+            log_results(args.strategy, *result)
 
-    cerebro.plot(style='candle', volume=False)
 
 # ---------------------------------------------
 #             COMMAND-LINE INTERFACE
 # ---------------------------------------------
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Backtest a trading strategy for a given stock ticker using Alpaca data.')
-    parser.add_argument('--ticker', type=str, required=True, help='Stock ticker symbol (e.g., TSLA)')
+    parser.add_argument('--ticker', type=str, help='Stock ticker symbol (e.g., TSLA)')
+    parser.add_argument('--tickers', type=str, help='Comma-separated ticker symbols to backtest in parallel (e.g., TSLA,AAPL,MSFT)')
     parser.add_argument('--start', type=str, default='2019-01-01', help='Start date (YYYY-MM-DD) [default: 2019-01-01]')
     parser.add_argument('--end', type=str, default='2025-02-01', help='End date (YYYY-MM-DD) [default: 2025-02-01]')
     parser.add_argument('--timeframe', type=str, default='1D', help='Candlestick timeframe (e.g., "1Min", "5Min", "15Min", "1D")')
     parser.add_argument('--principal', type=float, default=1000, help='Initial cash/principal amount (default: 1000)')
     parser.add_argument('--commission', type=float, default=0.0003, help='Brokerage fee as commission per transaction (default: 0.03%%, i.e., 0.0003)')
-    parser.add_argument('--percent', type=float, default=20, help='Percentage of portfolio to invest per trade (default: 20%)')
+    parser.add_argument('--percent', type=float, default=20, help='Percentage of portfolio to invest per trade (default: 20%%)')
     parser.add_argument('--strategy', type=str, choices=['MarketStructure', 'TestStrat1', 'marketstructure', 'volpivots', 'sma', 'bbbreak'], default='MarketStructure', help='Strategy to run (default: MarketStructure)')
     
     # Parameters for MarketStructureStrategy:
@@ -282,14 +423,13 @@ if __name__ == '__main__':
     parser.add_argument('--bbbreak-stop-loss', type=float, default=0.05, help='Stop loss percentage for BollingerBreakoutStrategy (default: 0.05)')
     parser.add_argument('--bbbreak-take-profit', type=float, default=0.10, help='Take profit percentage for BollingerBreakoutStrategy (default: 0.10)')
 
-    args = parser.parse_args()
-    main(args)
+    parser.add_argument('--no-cache', action='store_true', help='Always download bars from Alpaca instead of using the local bar cache')
+    parser.add_argument('--engine', type=str, choices=['backtrader', 'vectorized'], default='backtrader', help='Backtest engine; "vectorized" replays the sma strategy with NumPy instead of Cerebro (default: backtrader)')
+    parser.add_argument('--plot', action=argparse.BooleanOptionalAction, default=False, help='Show the Backtrader chart after the run (default: --no-plot)')
+    parser.add_argument('--verbose', action='store_true', help='Log indicator values on every bar (sma strategy)')
+    parser.add_argument('--save-plot', action='store_true', help='Save the Backtrader chart to Results/<strategy>_<ticker>.png instead of showing it')
 
-STRATEGIES = {
-    'sma': SmaCross,
-    'bbbreak': BollingerBreakoutStrategy,
-    'rsimacd': RsiMacdStrategy,
-    'teststrat1': TestStrat1,
-    'volpivots': HighVolPivotsStrategy,
-    'marketstructure': MarketStructureStrategy
-}
\ No newline at end of file
+    args = parser.parse_args()
+    if not args.ticker and not args.tickers:
+        parser.error('one of --ticker or --tickers is required')
+    main(args)
\ No newline at end of file
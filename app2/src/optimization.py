@@ -4,8 +4,17 @@ import datetime
 import backtrader as bt
 from dotenv import load_dotenv
 import pandas as pd
+import numpy as np
 import alpaca_trade_api as tradeapi
 import importlib
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from bars_cache import cached_bars
+from feeds import ArrayData
+import fast_backtest
+import indicator_cache
 
 # ---------------------------------------------
 #         LOAD ENVIRONMENT VARIABLES
@@ -18,14 +27,15 @@ ALPACA_API_KEY = os.getenv('APCA_API_KEY_ID')
 ALPACA_API_SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
 ALPACA_API_URL = os.getenv('APCA_API_BASE_URL', 'https://paper-api.alpaca.markets/v2')
 
+@functools.lru_cache(maxsize=1)
 def get_alpaca_api():
-    api = tradeapi.REST(
+    """Shared Alpaca REST client, so every download in the process reuses one keep-alive HTTP session"""
+    return tradeapi.REST(
         key_id=ALPACA_API_KEY,
         secret_key=ALPACA_API_SECRET_KEY,
         base_url=ALPACA_API_URL,
         api_version='v2'
     )
-    return api
 
 def chunk_date_range(start_date, end_date, chunk_size_days=30):
     current_start = start_date
@@ -121,21 +131,102 @@ def build_opt_params(optparams):
             opt_dict[param] = values
     return opt_dict
 
+def _sma_cross_replay(opens, closes, params, **broker):
+    return fast_backtest.sma_cross_backtest(opens, closes, params['sma_fast_period'], params['sma_slow_period'], **broker)
+
+def _rsi_macd_replay(opens, closes, params, **broker):
+    return fast_backtest.rsi_macd_backtest(opens, closes, **params, **broker)
+
+# Strategies the vectorized engine can sweep, with the fast_backtest replay of each one
+VECTORIZED_REPLAYS = {
+    'SmaCross': _sma_cross_replay,
+    'RsiMacdStrategy': _rsi_macd_replay,
+}
+
+def optimize_vectorized(data_df, opt_strategy_params, args):
+    """
+    Sweep a strategy over the optstrategy grid with its fast_backtest replay (see
+    VECTORIZED_REPLAYS) instead of one Cerebro run per combination; the indicators are
+    computed once per distinct period through indicator_cache, under a key of the closes
+    worked out once for the whole sweep.
+    Returns the best final portfolio value and that combination's full strategy parameters,
+    the first best combination in grid order like the Cerebro sweep.
+    """
+    strategy_class = getattr(importlib.import_module('strategy'), args.strategy)
+    replay = VECTORIZED_REPLAYS[args.strategy]
+
+    defaults = dict(strategy_class.params._getitems())
+    unknown = set(opt_strategy_params) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown {args.strategy} parameters: {', '.join(sorted(unknown))}")
+
+    opens = data_df['Open'].to_numpy(dtype=np.float64)
+    closes = data_df['Close'].to_numpy(dtype=np.float64)
+    key = indicator_cache.series_key(closes)
+    best_value, best_params = -float('inf'), None
+    for values in itertools.product(*opt_strategy_params.values()):
+        params = dict(defaults, **dict(zip(opt_strategy_params, values)))
+        result = replay(opens, closes, params, cash=args.principal, commission=args.commission, percent=args.percent,
+                        key=key)
+        if result['final_value'] > best_value:
+            best_value, best_params = result['final_value'], params
+    return best_value, best_params
+
+# Bars of the ticker being optimized, handed to each sweep worker once by its initializer
+_worker_bars = None
+
+def _init_sweep_worker(data_df):
+    global _worker_bars
+    _worker_bars = data_df
+
+def _run_sweep_point(params, args):
+    """Backtest one parameter combination in a sweep worker; returns the final value and the strategy's parameters"""
+    strategy_class = getattr(importlib.import_module('strategy'), args.strategy)
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(strategy_class, **params)
+    cerebro.adddata(ArrayData(dataname=_worker_bars))
+    cerebro.broker.setcash(args.principal)
+    cerebro.broker.setcommission(commission=args.commission)
+    # Use PercentSizer for dynamic percentage-based position sizing:
+    cerebro.addsizer(bt.sizers.PercentSizer, percents=args.percent)
+    strategy = cerebro.run()[0]
+    # _getitems() is a classmethod and would give the defaults, so read the run's own values
+    params = {name: getattr(strategy.params, name) for name in strategy.params._getkeys()}
+    return cerebro.broker.getvalue(), params
+
+def optimize_with_cerebro(data_df, opt_strategy_params, args):
+    """
+    One Cerebro run per combination of the optstrategy grid, spread over a process per core.
+    Each worker receives the bars once, through its initializer, and sends back only the final
+    value and the parameters, where cerebro.optstrategy pickles the data into every task and
+    every whole strategy back out. Returns the first best combination in grid order.
+    """
+    grid = [dict(zip(opt_strategy_params, values)) for values in itertools.product(*opt_strategy_params.values())]
+    workers = max(1, min(len(grid), os.cpu_count()))
+    best_value, best_params = -float('inf'), None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker, initargs=(data_df,)) as pool:
+        chunksize = max(1, len(grid) // (4 * workers))
+        for value, params in pool.map(_run_sweep_point, grid, itertools.repeat(args), chunksize=chunksize):
+            if value > best_value:
+                best_value, best_params = value, params
+    return best_value, best_params
+
 def main(args):
     api = get_alpaca_api()
     alpaca_timeframe = convert_timeframe(args.timeframe)
-    data_df = fetch_bars_in_chunks(api, args.ticker, alpaca_timeframe, args.start, args.end)
+    data_df = cached_bars(
+        lambda start, end: fetch_bars_in_chunks(api, args.ticker, alpaca_timeframe, start, end),
+        args.ticker, args.start, args.end, alpaca_timeframe,
+        use_cache=not args.no_cache
+    )
     if data_df.empty:
         print("No data returned from Alpaca for the specified parameters.")
         return
     data_df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}, inplace=True)
-    data_feed = bt.feeds.PandasData(dataname=data_df)
-    cerebro = bt.Cerebro(optreturn=False)
-    
-    # Dynamically import the strategy from the strategies file.
+
+    # Check the strategy exists in the strategies file; sweep workers import it themselves.
     try:
-        strategies_module = importlib.import_module('strategy')
-        strategy_class = getattr(strategies_module, args.strategy)
+        getattr(importlib.import_module('strategy'), args.strategy)
     except Exception as e:
         print(f"Error loading strategy '{args.strategy}': {e}")
         return
@@ -146,34 +237,22 @@ def main(args):
         print("No optimization parameters provided; exiting optimization.")
         return
 
-    cerebro.optstrategy(strategy_class, **opt_strategy_params)
-    cerebro.adddata(data_feed)
-    cerebro.broker.setcash(args.principal)
-    cerebro.broker.setcommission(commission=args.commission)
-    # Use PercentSizer for dynamic percentage-based position sizing:
-    cerebro.addsizer(bt.sizers.PercentSizer, percents=args.percent)
-    
+    if args.engine == 'vectorized' and args.strategy not in VECTORIZED_REPLAYS:
+        print(f"The vectorized engine only supports {', '.join(VECTORIZED_REPLAYS)}.")
+        return
+
     print("Starting optimization...")
+    sweep = optimize_vectorized if args.engine == 'vectorized' else optimize_with_cerebro
     try:
-        optimized_runs = cerebro.run()
+        best_value, best_params = sweep(data_df, opt_strategy_params, args)
     except Exception as e:
         print("Error during optimization run:", e)
         return
-    
-    best_result = None
-    best_value = -float('inf')
-    for run in optimized_runs:
-        strat = run[0]
-        final_value = strat.broker.getvalue()
-        if final_value > best_value:
-            best_value = final_value
-            best_result = strat
 
     print(f"Best final portfolio value: {best_value:.2f}")
-    # Use explicit check to avoid calling __nonzero__ on best_result:
-    if best_result is not None:
+    if best_params is not None:
         print("Best Strategy Parameters:")
-        for param, value in best_result.params._getitems():
+        for param, value in best_params.items():
             print(f"  {param}: {value}")
     else:
         print("No best result found.")
@@ -189,6 +268,8 @@ if __name__ == '__main__':
     parser.add_argument('--percent', type=float, default=10, help='Percentage of portfolio to invest per trade (default: 10%)')
     parser.add_argument('--strategy', type=str, required=True, help='Name of the strategy to optimize (must exist in strategies file)')
     parser.add_argument('--optparams', type=str, default='', help="Comma-separated optimization parameters in the format 'param:min:max,param2:min2:max2'.")
+    parser.add_argument('--no-cache', action='store_true', help='Always download bars from Alpaca instead of using the local bar cache')
+    parser.add_argument('--engine', type=str, choices=['backtrader', 'vectorized'], default='backtrader', help='Sweep engine; "vectorized" replays SmaCross or RsiMacdStrategy with NumPy instead of one Cerebro run per combination (default: backtrader)')
     
     args = parser.parse_args()
     main(args)
\ No newline at end of file
@@ -6,6 +6,7 @@
 TEST_TYPE="all"
 VERBOSE=0
 SKIP_INTEGRATION=0
+PARALLEL=0
 
 # Function to display usage
 function usage {
@@ -14,6 +15,7 @@ function usage {
     echo "  -t, --test-type TYPE    Type of tests to run (api, strategy, candlestick, integration, all)"
     echo "  -v, --verbose           Run with verbose output"
     echo "  -s, --skip-integration  Skip integration tests"
+    echo "  -p, --parallel          Run tests across all CPU cores (requires pytest-xdist)"
     echo "  -h, --help              Display this help message"
     exit 1
 }
@@ -33,6 +35,10 @@ while [[ $# -gt 0 ]]; do
             SKIP_INTEGRATION=1
             shift
             ;;
+        -p|--parallel)
+            PARALLEL=1
+            shift
+            ;;
         -h|--help)
             usage
             ;;
@@ -51,6 +57,11 @@ if [[ $VERBOSE -eq 1 ]]; then
     CMD="$CMD -v"
 fi
 
+# Distribute tests over all cores; loadgroup keeps xdist_group-marked tests on one worker
+if [[ $PARALLEL -eq 1 ]]; then
+    CMD="$CMD -n auto --dist loadgroup"
+fi
+
 # Skip integration tests if requested
 if [[ $SKIP_INTEGRATION -eq 1 ]]; then
     export SKIP_INTEGRATION_TESTS=1
@@ -1,40 +1,482 @@
+import sys
+import math
+import array
+import operator
+import functools
 import backtrader as bt
 import numpy as np
 from collections import deque
 
+import indicator_cache
+
+# Order states notify_order() waits through and gives up on, built once instead of as a list
+# per notification
+_PENDING = frozenset((bt.Order.Submitted, bt.Order.Accepted))
+_FAILED = frozenset((bt.Order.Canceled, bt.Order.Margin, bt.Order.Rejected))
+
+
+# -----------------------------
+# PrecomputedLine Indicator
+# -----------------------------
+class PrecomputedLine(bt.Indicator):
+    """
+    Serves a line from an array computed up front (see indicator_cache) instead of
+    recalculating it bar by bar. ``values[i]`` is the value for bar ``i`` of the data feed.
+
+    Parameters:
+    - values (np.ndarray): Precomputed values aligned with the data feed
+    - period (int): Minimum period before the values are valid
+    """
+    lines = ('value',)
+    params = (
+        ('values', None),
+        ('period', 1),
+    )
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def _plotlabel(self):
+        return []  # Keep the values array out of the chart legend
+
+    def next(self):
+        self.lines.value[0] = self.p.values[len(self) - 1]
+
+    def once(self, start, end):
+        dst = np.frombuffer(self.lines.value.array, dtype=np.float64)
+        dst[start:end] = self.p.values[start:end]
+
+
+def preloaded_line(data, name):
+    """
+    Return ``(values, key)`` for the line ``name`` of a preloaded feed: its full series and
+    the indicator_cache key of that series, or ``(None, None)`` when bars arrive live. Both
+    are worked out once per feed and kept on it, so every strategy run on the feed looks its
+    indicators up without copying and hashing the series again.
+    """
+    array = getattr(data.lines, name).array
+    if len(array) == 0 or len(data) > 1:
+        return None, None
+    preloaded = data.__dict__.setdefault('_preloaded_lines', {})
+    if name not in preloaded or len(preloaded[name][0]) != len(array):
+        values = np.frombuffer(array, dtype=np.float64).copy()
+        values.setflags(write=False)  # Shared by every run on the feed, never mutate
+        preloaded[name] = (values, indicator_cache.series_key(values))
+    return preloaded[name]
+
+
+def preloaded_closes(data):
+    """Return ``(closes, key)`` for a preloaded feed, or ``(None, None)`` when bars arrive live"""
+    return preloaded_line(data, 'close')
+
+
+def cached_sma(data, period):
+    """SMA of ``data.close`` served from indicator_cache when the whole feed is preloaded"""
+    closes, key = preloaded_closes(data)
+    if closes is None:
+        return StreamingSMA(data.close, period=period)
+    sma = PrecomputedLine(data.close, values=indicator_cache.get_sma(closes, period, key), period=period)
+    sma.plotinfo.plotname = 'SMA(%d)' % period
+    return sma
+
+
+def cached_rsi(data, period):
+    """RSI of ``data.close`` served from indicator_cache when the whole feed is preloaded"""
+    closes, key = preloaded_closes(data)
+    if closes is None:
+        return StreamingRSI(data.close, period=period)
+    rsi = PrecomputedLine(data.close, values=indicator_cache.get_rsi(closes, period, key), period=period + 1)
+    rsi.plotinfo.subplot = True
+    rsi.plotinfo.plotname = 'RSI(%d)' % period
+    return rsi
+
+
+def cached_atr(data, period):
+    """ATR of the feed's bars served from indicator_cache when the whole feed is preloaded"""
+    lines, keys = zip(*(preloaded_line(data, name) for name in ('high', 'low', 'close')))
+    if lines[-1] is None:
+        return bt.indicators.ATR(data, period=period)
+    atr = PrecomputedLine(data.close, values=indicator_cache.get_atr(*lines, period, keys), period=period + 1)
+    atr.plotinfo.subplot = True
+    atr.plotinfo.plotname = 'ATR(%d)' % period
+    return atr
+
+
+def cached_macd(data, fast, slow, signal):
+    """MACD ``macd`` and ``signal`` lines of ``data.close``, served like ``cached_sma``"""
+    closes, key = preloaded_closes(data)
+    if closes is None:
+        return StreamingMACD(data.close, period_me1=fast, period_me2=slow, period_signal=signal)
+    macd_values, signal_values = indicator_cache.get_macd(closes, fast, slow, signal, key)
+    return PrecomputedMACD(data.close, macd_values=macd_values, signal_values=signal_values,
+                           period=max(fast, slow) + signal - 1)
+
+
+def precomputed_crossover(data, a, b, start):
+    """
+    ``bt.indicators.CrossOver`` of two precomputed series (see ``indicator_cache.crossover``),
+    served as a PrecomputedLine. ``start`` is the first bar where both series are valid.
+    """
+    cross = PrecomputedLine(data.close, values=indicator_cache.crossover(a, b, start).astype(np.float64),
+                            period=start + 2)
+    cross.plotinfo.subplot = True
+    cross.plotinfo.plotname = 'CrossOver'
+    return cross
+
+
+def current_value(line):
+    """
+    Callable returning ``line[0]``. A partial rather than a lambda, so strategies holding it
+    still pickle, as optstrategy workers need to send them back.
+    """
+    return functools.partial(operator.getitem, line, 0)
+
+
+def exit_prices(entry_price, take_profit, stop_loss):
+    """
+    (take-profit, stop-loss) prices of a position entered at ``entry_price``. A take profit of 0
+    is disabled (+inf); a stop loss of 0 sits at the entry price, -inf only without one.
+    """
+    tp_price = entry_price * (1 + take_profit) if take_profit > 0 else math.inf
+    sl_price = entry_price * (1 - stop_loss) if entry_price else -math.inf
+    return tp_price, sl_price
+
+
+class InlineCrossOver:
+    """
+    ``bt.indicators.CrossOver`` of two lines, worked out in the strategy's ``next()`` from
+    their current values and the last non-zero difference instead of kept as an indicator
+    with line buffers of its own.
+
+    Call it once per bar from the first bar both lines are valid: that call seeds the
+    difference and returns None (bt's CrossOver has no value there either), later calls
+    return 1.0, -1.0 or 0.0.
+    """
+    __slots__ = ('a', 'b', 'prev')
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        self.prev = None
+
+    def __call__(self):
+        diff = self.a[0] - self.b[0]
+        prev = self.prev
+        if prev is None:
+            self.prev = diff
+            return None
+        if diff:
+            self.prev = diff
+        if prev < 0 < diff:
+            return 1.0
+        if prev > 0 > diff:
+            return -1.0
+        return 0.0
+
+
+class PrecomputedMACD(bt.Indicator):
+    """
+    ``bt.indicators.MACD``'s ``macd`` and ``signal`` lines served from arrays computed up
+    front (see ``indicator_cache.get_macd``), like PrecomputedLine.
+    """
+    lines = ('macd', 'signal')
+    params = (
+        ('macd_values', None),
+        ('signal_values', None),
+        ('period', 1),
+    )
+    plotinfo = dict(subplot=True, plotname='MACD')
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def _plotlabel(self):
+        return []  # Keep the values arrays out of the chart legend
+
+    def next(self):
+        i = len(self) - 1
+        self.lines.macd[0] = self.p.macd_values[i]
+        self.lines.signal[0] = self.p.signal_values[i]
+
+    def once(self, start, end):
+        for line, values in ((self.lines.macd, self.p.macd_values), (self.lines.signal, self.p.signal_values)):
+            np.frombuffer(line.array, dtype=np.float64)[start:end] = values[start:end]
+
+
+# -----------------------------
+# Streaming Indicators
+# -----------------------------
+class StreamingSMA(bt.Indicator):
+    """
+    Same values as ``bt.indicators.SMA``, but each bar adds the newest value to a running
+    window sum and subtracts the one leaving it, instead of summing all ``period`` values again.
+    """
+    lines = ('sma',)
+    params = (('period', 30),)
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def nextstart(self):
+        self._sum = indicator_cache.WindowSum(self.data.get(size=self.p.period))
+        self.lines.sma[0] = self._sum.value() / self.p.period
+
+    def next(self):
+        self._sum.slide(self.data[0], self.data[-self.p.period])
+        self.lines.sma[0] = self._sum.value() / self.p.period
+
+    def oncestart(self, start, end):
+        self._sum = indicator_cache.WindowSum(self.data.array[start - self.p.period + 1:start + 1])
+        self.lines.sma.array[start] = self._sum.value() / self.p.period
+
+    def once(self, start, end):
+        src, dst, period, window = self.data.array, self.lines.sma.array, self.p.period, self._sum
+        for i in range(start, end):
+            window.slide(src[i], src[i - period])
+            dst[i] = window.value() / period
+
+
+class StreamingBollinger(bt.Indicator):
+    """
+    Same values as ``bt.indicators.BollingerBands``, with the window sums of the value and
+    its square updated in O(1) per bar like ``StreamingSMA``; the deviation is derived from
+    them with bt's mean-of-squares formula rather than an online variance recurrence, so the
+    bands don't differ from bt's by a rounding error that would move crossovers.
+    """
+    lines = ('mid', 'top', 'bot')
+    params = (('period', 20), ('devfactor', 2.0))
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def _seed(self, window):
+        self._sum = indicator_cache.WindowSum(window)
+        self._sum_sq = indicator_cache.WindowSum([x ** 2 for x in window])  # ** like bt, not x * x: pow rounds differently
+
+    def _slide(self, new, old):
+        """Slide both window sums and return the bands ``(mid, top, bot)``"""
+        if new is not None:
+            self._sum.slide(new, old)
+            self._sum_sq.slide(new ** 2, old ** 2)
+        mid = self._sum.value() / self.p.period
+        std = abs(self._sum_sq.value() / self.p.period - mid ** 2) ** 0.5  # bt's StdDev with safepow
+        return mid, mid + self.p.devfactor * std, mid - self.p.devfactor * std
+
+    def nextstart(self):
+        self._seed(self.data.get(size=self.p.period))
+        self.lines.mid[0], self.lines.top[0], self.lines.bot[0] = self._slide(None, None)
+
+    def next(self):
+        bands = self._slide(self.data[0], self.data[-self.p.period])
+        self.lines.mid[0], self.lines.top[0], self.lines.bot[0] = bands
+
+    def oncestart(self, start, end):
+        self._seed(self.data.array[start - self.p.period + 1:start + 1])
+        bands = self._slide(None, None)
+        self.lines.mid.array[start], self.lines.top.array[start], self.lines.bot.array[start] = bands
+
+    def once(self, start, end):
+        src, period = self.data.array, self.p.period
+        mid, top, bot = self.lines.mid.array, self.lines.top.array, self.lines.bot.array
+        for i in range(start, end):
+            mid[i], top[i], bot[i] = self._slide(src[i], src[i - period])
+
+
+class StreamingRSI(bt.Indicator):
+    """
+    Same values as ``bt.indicators.RSI`` (Wilder smoothing, no safediv) from two running
+    averages updated in place, instead of bt's chain of UpDay/DownDay/SMMA line objects.
+    """
+    lines = ('rsi',)
+    params = (('period', 14), ('upperband', 70.0), ('lowerband', 30.0))
+
+    def _plotinit(self):
+        self.plotinfo.plotyhlines = [self.p.upperband, self.p.lowerband]
+
+    def __init__(self):
+        self.addminperiod(self.p.period + 1)
+        self._alpha = 1.0 / self.p.period
+        self._alpha1 = 1.0 - self._alpha
+
+    def _seed(self, closes):
+        # Both averages start as the plain mean of the first ``period`` changes
+        changes = [b - a for a, b in zip(closes, closes[1:])]
+        self._up = math.fsum(max(c, 0.0) for c in changes) / self.p.period
+        self._down = math.fsum(max(-c, 0.0) for c in changes) / self.p.period
+        return self._rsi()
+
+    def _update(self, change):
+        self._up = self._up * self._alpha1 + max(change, 0.0) * self._alpha
+        self._down = self._down * self._alpha1 + max(-change, 0.0) * self._alpha
+        return self._rsi()
+
+    def _rsi(self):
+        return 100.0 - 100.0 / (1.0 + self._up / self._down)
+
+    def nextstart(self):
+        self.lines.rsi[0] = self._seed(self.data.get(size=self.p.period + 1))
+
+    def next(self):
+        self.lines.rsi[0] = self._update(self.data[0] - self.data[-1])
+
+    def oncestart(self, start, end):
+        self.lines.rsi.array[start] = self._seed(self.data.array[start - self.p.period:start + 1])
+
+    def once(self, start, end):
+        src, dst = self.data.array, self.lines.rsi.array
+        for i in range(start, end):
+            dst[i] = self._update(src[i] - src[i - 1])
+
+
+class StreamingMACD(bt.Indicator):
+    """
+    Same values as ``bt.indicators.MACD`` from its three EMAs kept as running values and
+    updated in place, instead of bt's chain of EMA, difference and signal EMA line objects.
+    """
+    lines = ('macd', 'signal')
+    params = (('period_me1', 12), ('period_me2', 26), ('period_signal', 9))
+    plotinfo = dict(subplot=True, plothlines=[0.0])
+    plotlines = dict(signal=dict(ls='--'))
+
+    def __init__(self):
+        self._macd_start = max(self.p.period_me1, self.p.period_me2) - 1
+        self._size = self._macd_start + self.p.period_signal
+        self.addminperiod(self._size)
+        self._alphas = [(2.0 / (1.0 + p), 1.0 - 2.0 / (1.0 + p))
+                        for p in (self.p.period_me1, self.p.period_me2, self.p.period_signal)]
+
+    def _seed(self, window):
+        """Run the EMAs over the first ``minperiod`` values and return the macd values so far"""
+        fast = indicator_cache.ema(window, self.p.period_me1)
+        slow = indicator_cache.ema(window, self.p.period_me2)
+        macd = [a - b for a, b in zip(fast, slow)][self._macd_start:]
+        signal = indicator_cache.ema(macd, self.p.period_signal)
+        self._fast, self._slow, self._signal = fast[-1], slow[-1], signal[-1]
+        return macd
+
+    def _update(self, price):
+        (fast_alpha, fast_alpha1), (slow_alpha, slow_alpha1), (signal_alpha, signal_alpha1) = self._alphas
+        self._fast = self._fast * fast_alpha1 + price * fast_alpha
+        self._slow = self._slow * slow_alpha1 + price * slow_alpha
+        macd = self._fast - self._slow
+        self._signal = self._signal * signal_alpha1 + macd * signal_alpha
+        return macd, self._signal
+
+    def nextstart(self):
+        macd = self._seed(self.data.get(size=self._size))
+        # The macd line is valid before the signal is, as in bt's MACD
+        for ago, value in enumerate(reversed(macd)):
+            self.lines.macd[-ago] = value
+        self.lines.signal[0] = self._signal
+
+    def next(self):
+        self.lines.macd[0], self.lines.signal[0] = self._update(self.data[0])
+
+    def oncestart(self, start, end):
+        macd = self._seed(self.data.array[start - self._size + 1:start + 1])
+        self.lines.macd.array[start - len(macd) + 1:start + 1] = array.array('d', macd)
+        self.lines.signal.array[start] = self._signal
+
+    def once(self, start, end):
+        src, macd, signal = self.data.array, self.lines.macd.array, self.lines.signal.array
+        for i in range(start, end):
+            macd[i], signal[i] = self._update(src[i])
+
+
+class LogBuffer:
+    """
+    Strategy mixin that collects log lines and writes them to stdout in one go once the run
+    stops. Cerebro drives every bar and its order notifications through _next(), or
+    _oncepost() with runonce; if one of them raises, the lines collected so far are written
+    before the error propagates, so a crashed run still shows its log.
+    """
+
+    def __init__(self):
+        self._log_lines = []
+
+    def buffer_log(self, line):
+        self._log_lines.append(line)
+
+    def flush_log(self):
+        sys.stdout.writelines(self._log_lines)
+        self._log_lines = []
+
+    def _next(self):
+        try:
+            super()._next()
+        except BaseException:
+            self.flush_log()
+            raise
+
+    def _oncepost(self, dt):
+        try:
+            super()._oncepost(dt)
+        except BaseException:
+            self.flush_log()
+            raise
+
+    def _stop(self):
+        try:
+            super()._stop()
+        finally:
+            self.flush_log()
+
+
 # -----------------------------
 # SmaCross Strategy
 # -----------------------------
-class SmaCross(bt.Strategy):
+class SmaCross(LogBuffer, bt.Strategy):
     params = dict(
         sma_fast_period=50,         # Fast SMA period
         sma_slow_period=200,        # Slow SMA period
-        take_profit=0.0             # Take profit percentage (0 means disabled)
+        take_profit=0.0,            # Take profit percentage (0 means disabled)
+        verbose=False               # Log the SMA and crossover values on every bar
     )
 
     def __init__(self):
-        self.sma_fast = bt.indicators.SMA(self.data.close, period=self.p.sma_fast_period)
-        self.sma_slow = bt.indicators.SMA(self.data.close, period=self.p.sma_slow_period)
-        self.crossover = bt.indicators.CrossOver(self.sma_fast, self.sma_slow)
+        super().__init__()
+        self.sma_fast = cached_sma(self.data, self.p.sma_fast_period)
+        self.sma_slow = cached_sma(self.data, self.p.sma_slow_period)
+        closes, key = preloaded_closes(self.data)
+        if closes is None:
+            # Bars arrive one at a time: compare the two SMAs in next() instead of keeping a
+            # CrossOver indicator and its line buffers
+            self._crossover = InlineCrossOver(self.sma_fast, self.sma_slow)
+        else:
+            # Whole feed is known: compute every crossover up front, next() just reads it
+            crossover = precomputed_crossover(
+                self.data,
+                indicator_cache.get_sma(closes, self.p.sma_fast_period, key),
+                indicator_cache.get_sma(closes, self.p.sma_slow_period, key),
+                max(self.p.sma_fast_period, self.p.sma_slow_period) - 1)
+            self._crossover = current_value(crossover)
+        self._verbose = bool(self.p.verbose)
         self.entry_price = None
         self.order = None
         self.num_trades = 0
         self.num_profitable_trades = 0
 
     def next(self):
-        if self.order:
+        # Evaluated on every bar, even while an order is pending, so the inline crossover
+        # tracks the last non-zero difference
+        crossover = self._crossover()
+        if self.order or crossover is None:
             return
 
         # Log the current values of the SMAs and crossover
-        self.log(f"SMA Fast: {self.sma_fast[0]:.2f}, SMA Slow: {self.sma_slow[0]:.2f}, Crossover: {self.crossover[0]}")
+        if self._verbose:
+            self.log(f"SMA Fast: {self.sma_fast[0]:.2f}, SMA Slow: {self.sma_slow[0]:.2f}, Crossover: {crossover}")
 
         if not self.position:
-            if self.crossover > 0:  # Buy signal
+            if crossover > 0:  # Buy signal
                 self.order = self.buy()
                 self.entry_price = self.data.close[0]
                 self.log(f"BUY EXECUTED, Price: {self.entry_price:.2f}")
         else:
-            if self.crossover < 0:  # Sell signal
+            if crossover < 0:  # Sell signal
                 self.order = self.close()
                 self.log(f"SELL EXECUTED, Price: {self.data.close[0]:.2f}")
                 # Track the trade
@@ -44,10 +486,10 @@ class SmaCross(bt.Strategy):
 
     def log(self, txt):
         dt = self.data.datetime.date(0)
-        print(f"{dt.isoformat()} - {txt}")
+        self.buffer_log(f"{dt.isoformat()} - {txt}\n")
 
     def notify_order(self, order):
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.log(f"Buy order executed at {order.executed.price:.2f}")
             elif order.issell():
@@ -63,64 +505,83 @@ class SmaCross(bt.Strategy):
 # BollingerBreakoutStrategy
 # -----------------------------
 
-class BollingerBreakoutStrategy(bt.Strategy):
+class BollingerBreakoutStrategy(LogBuffer, bt.Strategy):
     params = dict(
         period=20,         # Bollinger Bands period
         devfactor=2.0,     # Bollinger Bands deviation factor
-        stop_loss=0.00,    # Stop loss percentage (0 means disabled)
+        stop_loss=0.00,    # Stop loss percentage (0 exits on any close below the entry price)
         take_profit=0.0     # Take profit percentage (0 means disabled)
     )
 
     def __init__(self):
-        self.bbands = bt.indicators.BollingerBands(self.data.close,
-                                                    period=self.p.period,
-                                                    devfactor=self.p.devfactor)
-        self.bbands.plotinfo.plot = False
-        self.crossup = bt.indicators.CrossOver(self.data.close, self.bbands.top)
-        self.crossdown = bt.indicators.CrossOver(self.data.close, self.bbands.mid)
-        self.crossup.plotinfo.plot = False
-        self.crossdown.plotinfo.plot = False
+        super().__init__()
+        closes, key = preloaded_closes(self.data)
+        if closes is None:
+            self.bbands = StreamingBollinger(self.data.close,
+                                             period=self.p.period,
+                                             devfactor=self.p.devfactor)
+            self.bbands.plotinfo.plot = False
+            # Compare the close with the bands in next() instead of keeping two CrossOver
+            # indicators and their line buffers
+            self._crossup = InlineCrossOver(self.data.close, self.bbands.top)
+            self._crossdown = InlineCrossOver(self.data.close, self.bbands.mid)
+        else:
+            # Whole feed is known: compute the bands and both crossover signals up front
+            mid, top, _ = indicator_cache.get_bollinger(closes, self.p.period, self.p.devfactor, key)
+            crossup = precomputed_crossover(self.data, closes, top, self.p.period - 1)
+            crossdown = precomputed_crossover(self.data, closes, mid, self.p.period - 1)
+            crossup.plotinfo.plot = False
+            crossdown.plotinfo.plot = False
+            self._crossup = current_value(crossup)
+            self._crossdown = current_value(crossdown)
+        # Params are fixed for the run; resolve them once rather than on every bar
+        self._tp = float(self.p.take_profit)
+        self._sl = float(self.p.stop_loss)
         self.order = None
         self.entry_price = None
+        self.tp_price = self.sl_price = None
         self.num_trades = 0
         self.num_profitable_trades = 0
 
     def next(self):
-        if self.order:
+        # Both crossovers are evaluated on every bar so the inline ones keep their state
+        crossup, crossdown = self._crossup(), self._crossdown()
+        if self.order or crossup is None:
             return
 
         if not self.position:
-            if self.crossup > 0:  # Buy signal
+            if crossup > 0:  # Buy signal
                 self.order = self.buy()
                 self.entry_price = self.data.close[0]
+                self.tp_price, self.sl_price = exit_prices(self.entry_price, self._tp, self._sl)
                 self.log(f"BUY EXECUTED, Price: {self.entry_price:.2f}")
         else:
-            if self.entry_price is None:
-                self.entry_price = self.position.price
-            if self.p.take_profit > 0 and self.data.close[0] >= self.entry_price * (1 + self.p.take_profit):
-                self.order = self.close()
-                self.log(f"SELL EXECUTED, Price: {self.data.close[0]:.2f}")
-                self.num_trades += 1
-                if self.data.close[0] > self.entry_price:  # Check if the trade was profitable
-                    self.num_profitable_trades += 1
-                return
-            if self.entry_price and self.data.close[0] < self.entry_price * (1 - self.p.stop_loss):
-                self.order = self.close()
-                self.log(f"SELL EXECUTED, Price: {self.data.close[0]:.2f}")
-                self.num_trades += 1
-                if self.data.close[0] > self.entry_price:  # Check if the trade was profitable
-                    self.num_profitable_trades += 1
+            px = self.data.close[0]
+            if px >= self.tp_price:
+                reason = "TAKE PROFIT"
+            elif px < self.sl_price:
+                reason = "STOP LOSS"
+            elif crossdown < 0:  # Sell signal
+                reason = "CROSSDOWN"
+            else:
                 return
-            if self.crossdown < 0:  # Sell signal
-                self.order = self.close()
-                self.log(f"SELL EXECUTED, Price: {self.data.close[0]:.2f}")
-                self.num_trades += 1
-                if self.data.close[0] > self.entry_price:  # Check if the trade was profitable
-                    self.num_profitable_trades += 1
+            self._maybe_exit(px, reason)
+
+    def _maybe_exit(self, px, reason):
+        """Close the position and record the trade outcome"""
+        self.order = self.close()
+        self.log(f"SELL EXECUTED ({reason}), Price: {px:.2f}")
+        self.num_trades += 1
+        self.num_profitable_trades += px > self.entry_price  # Check if the trade was profitable
+
+    def notify_order(self, order):
+        # Let next() place the next order once this one is done, whatever its outcome
+        if order.status not in _PENDING:
+            self.order = None
 
     def log(self, txt):
         dt = self.data.datetime.date(0)
-        print(f"{dt.isoformat()} - {txt}")
+        self.buffer_log(f"{dt.isoformat()} - {txt}\n")
 
     def stop(self):
         # Log the results at the end of the strategy
@@ -130,7 +591,7 @@ class BollingerBreakoutStrategy(bt.Strategy):
 # -----------------------------
 # RsiMacdStrategy
 # -----------------------------
-class RsiMacdStrategy(bt.Strategy):
+class RsiMacdStrategy(LogBuffer, bt.Strategy):
     params = dict(
         rsi_period=14,
         rsi_oversold=30,
@@ -143,58 +604,86 @@ class RsiMacdStrategy(bt.Strategy):
     )
 
     def __init__(self):
-        self.rsi = bt.indicators.RSI(self.data.close, period=self.p.rsi_period)
-        self.macd = bt.indicators.MACD(self.data.close,
-                                       period_me1=self.p.macd_fast,
-                                       period_me2=self.p.macd_slow,
-                                       period_signal=self.p.macd_signal)
+        super().__init__()
+        # On a preloaded feed RSI and MACD come from indicator_cache, so a sweep over the
+        # thresholds or exits computes them once per series instead of once per run
+        self.rsi = cached_rsi(self.data, self.p.rsi_period)
+        self.macd = cached_macd(self.data, self.p.macd_fast, self.p.macd_slow, self.p.macd_signal)
+        self._rsi_oversold = float(self.p.rsi_oversold)
+        self._rsi_overbought = float(self.p.rsi_overbought)
+        self._tp = float(self.p.take_profit)
+        self._sl = float(self.p.stop_loss)
+        # Every bar's entry and exit conditions at once when the indicators are precomputed,
+        # so _buy_signal/_exit_signal become plain list lookups
+        self._buy_mask = self._exit_mask = None
+        if isinstance(self.macd, PrecomputedMACD):
+            rsi, macd, signal = self.rsi.p.values, self.macd.p.macd_values, self.macd.p.signal_values
+            self._buy_mask = ((rsi < self._rsi_oversold) & (macd > signal)).tolist()
+            self._exit_mask = ((rsi > self._rsi_overbought) | (macd < signal)).tolist()
         self.order = None
         self.entry_price = None
+        self.tp_price = self.sl_price = None
+
+    def nextstart(self):
+        # The line buffers are final once the run starts and hold every bar so far, so next()
+        # reads bar i straight from the arrays instead of going through four line __getitem__
+        # calls. exactbars would swap them for rolling buffers where bar i isn't at index i.
+        assert not self.cerebro.p.exactbars, "RsiMacdStrategy needs the full line buffers, not exactbars"
+        self._close = self.data.close.array
+        self._rsi = self.rsi.lines[0].array
+        self._macd = self.macd.macd.array
+        self._signal = self.macd.signal.array
+        self.next()
 
     def next(self):
         if self.order:
             return
 
+        i = len(self.data.close) - 1
         if not self.position:
-            if self.rsi[0] < self.p.rsi_oversold and self.macd.macd[0] > self.macd.signal[0]:
+            if self._buy_signal(i):
                 self.order = self.buy()
         else:
-            if self.entry_price is None:
-                self.entry_price = self.position.price
-            if self.p.take_profit > 0 and self.data.close[0] >= self.entry_price * (1 + self.p.take_profit):
-                self.order = self.close()
-                return
-            if self.entry_price and self.data.close[0] < self.entry_price * (1 - self.p.stop_loss):
-                self.order = self.close()
-                return
-            if self.rsi[0] > self.p.rsi_overbought or self.macd.macd[0] < self.macd.signal[0]:
+            px = self._close[i]
+            if px >= self.tp_price or px < self.sl_price or self._exit_signal(i):
                 self.order = self.close()
 
+    def _buy_signal(self, i):
+        if self._buy_mask is not None:
+            return self._buy_mask[i]
+        return self._rsi[i] < self._rsi_oversold and self._macd[i] > self._signal[i]
+
+    def _exit_signal(self, i):
+        if self._exit_mask is not None:
+            return self._exit_mask[i]
+        return self._rsi[i] > self._rsi_overbought or self._macd[i] < self._signal[i]
+
     def notify_order(self, order):
-        if order.status in [order.Submitted, order.Accepted]:
+        if order.status in _PENDING:
             return
 
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.entry_price = order.executed.price
+                self.tp_price, self.sl_price = exit_prices(self.entry_price, self._tp, self._sl)
                 self.log("BUY EXECUTED, Price: %.2f" % order.executed.price)
             elif order.issell():
                 self.log("SELL EXECUTED, Price: %.2f" % order.executed.price)
-                self.entry_price = None
+                self.entry_price = self.tp_price = self.sl_price = None
             self.order = None
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
+        elif order.status in _FAILED:
             self.log("Order Canceled/Margin/Rejected")
             self.order = None
 
     def log(self, txt, dt=None):
         dt = dt or self.data.datetime.datetime(0)
-        print(f"{dt.isoformat()} {txt}")
+        self.buffer_log(f"{dt.isoformat()} {txt}\n")
 
 
 # -----------------------------
 # TestStrat1
 # -----------------------------
-class TestStrat1(bt.Strategy):
+class TestStrat1(LogBuffer, bt.Strategy):
     """
     TestStrat1 is designed for a 15-minute timeframe, combining multiple indicators to
     trigger trade entries and exits. It uses:
@@ -243,12 +732,23 @@ class TestStrat1(bt.Strategy):
     )
 
     def __init__(self):
-        self.bbands = bt.indicators.BollingerBands(self.data.close,
-                                                    period=self.p.bb_period,
-                                                    devfactor=self.p.bb_dev)
-        self.sma_short = bt.indicators.SMA(self.data.close, period=self.p.sma_short_period)
-        self.sma_long = bt.indicators.SMA(self.data.close, period=self.p.sma_long_period)
-        self.atr = bt.indicators.ATR(self.data, period=self.p.atr_period)
+        super().__init__()
+        closes, key = preloaded_closes(self.data)
+        if closes is None:
+            self.bbands = StreamingBollinger(self.data.close,
+                                             period=self.p.bb_period,
+                                             devfactor=self.p.bb_dev)
+            self.bb_top, self.bb_bot = self.bbands.top, self.bbands.bot
+        else:
+            # Whole feed is known: the bands come from indicator_cache, shared by every run of
+            # a sweep over the same series and period/devfactor
+            _, top, bot = indicator_cache.get_bollinger(closes, self.p.bb_period, self.p.bb_dev, key)
+            self.bb_top = PrecomputedLine(self.data.close, values=top, period=self.p.bb_period)
+            self.bb_bot = PrecomputedLine(self.data.close, values=bot, period=self.p.bb_period)
+        self.sma_short = cached_sma(self.data, self.p.sma_short_period)
+        self.sma_long = cached_sma(self.data, self.p.sma_long_period)
+        self.atr = cached_atr(self.data, self.p.atr_period)
+        self._crossover_bars = self.p.sma_crossover_bars
         self.order = None
         self.entry_price = None
         self.num_trades = 0
@@ -264,23 +764,24 @@ class TestStrat1(bt.Strategy):
         else:
             self.sma_crossed_bars = 0
 
+        px = self.data.close[0]
         if not self.position:
-            if self.data.close[0] < self.bbands.lines.bot[0] and self.sma_crossed_bars >= self.p.sma_crossover_bars:
+            if px < self.bb_bot[0] and self.sma_crossed_bars >= self._crossover_bars:
                 self.order = self.buy()
-                self.entry_price = self.data.close[0]
+                self.entry_price = px
                 self.log(f"BUY EXECUTED, Price: {self.entry_price:.2f}")
         else:
-            if self.data.close[0] > self.bbands.lines.top[0] and self.sma_crossed_bars < self.p.sma_crossover_bars:
+            if px > self.bb_top[0] and self.sma_crossed_bars < self._crossover_bars:
                 self.order = self.close()
-                self.log(f"SELL EXECUTED, Price: {self.data.close[0]:.2f}")
+                self.log(f"SELL EXECUTED, Price: {px:.2f}")
                 # Track the trade
                 self.num_trades += 1
-                if self.data.close[0] > self.entry_price:  # Check if the trade was profitable
+                if px > self.entry_price:  # Check if the trade was profitable
                     self.num_profitable_trades += 1
 
     def log(self, txt):
         dt = self.data.datetime.date(0)
-        print(f"{dt.isoformat()} - {txt}")
+        self.buffer_log(f"{dt.isoformat()} - {txt}\n")
 
     def stop(self):
         # Log the results at the end of the strategy
@@ -312,7 +813,7 @@ class PivotLine(bt.Indicator):
 # -----------------------------
 # New Strategy: HighVolPivotsStrategy
 # -----------------------------
-class HighVolPivotsStrategy(bt.Strategy):
+class HighVolPivotsStrategy(LogBuffer, bt.Strategy):
     """
     HighVolPivotsStrategy detects pivot highs and pivot lows occurring alongside
     high trading volume. Inspired by PineScript logic, it:
@@ -343,41 +844,52 @@ class HighVolPivotsStrategy(bt.Strategy):
     )
 
     def __init__(self):
+        super().__init__()
         self.volume_window = deque(maxlen=self.p.lookback)
         self.pivot_points = []
         self.pivot_lines = []
+        # Whole feed is known: compute every bar's reference volume in one vectorized pass,
+        # next() just reads it instead of sorting the lookback window on every bar
+        volumes, key = preloaded_line(self.data, 'volume')
+        self.reference_vols = None if volumes is None else \
+            indicator_cache.get_rolling_percentile(volumes, self.p.lookback, self.p.percentile_rank, key)
 
     def next(self):
         current_vol = self.data.volume[0]
-        self.volume_window.append(current_vol)
+        if self.reference_vols is None:
+            self.volume_window.append(current_vol)
 
         if len(self.data) <= (self.p.left_bars + self.p.right_bars):
             return
 
         pivot_index = -self.p.right_bars
 
-        if len(self.volume_window) < self.p.lookback:
-            return
-
-        vol_array = np.array(self.volume_window)
-        reference_vol = np.percentile(vol_array, self.p.percentile_rank)
+        if self.reference_vols is not None:
+            reference_vol = self.reference_vols[len(self.data) - 1]
+            if np.isnan(reference_vol):  # Fewer than lookback bars so far
+                return
+        else:
+            if len(self.volume_window) < self.p.lookback:
+                return
+            vol_array = np.array(self.volume_window)
+            reference_vol = np.percentile(vol_array, self.p.percentile_rank)
         if reference_vol == 0:
             return
         norm_vol = (current_vol / reference_vol) * 5
 
         pivot_price = self.data.close[pivot_index]
-        left_slice = self.data.close.get(ago=self.p.right_bars, size=self.p.left_bars)
-        right_slice = self.data.close.get(ago=0, size=self.p.right_bars)
-        if not left_slice or not right_slice:
+        # get() copies the windows out of the line buffer; the left one ends right_bars before
+        # the current bar
+        left_values = self.data.close.get(ago=-self.p.right_bars, size=self.p.left_bars)
+        right_values = self.data.close.get(ago=0, size=self.p.right_bars)
+        if not left_values or not right_values:
             return
 
-        left_values = list(left_slice)
-        right_values = list(right_slice)
+        left_max, left_min = max(left_values), min(left_values)
+        right_max, right_min = max(right_values), min(right_values)
 
-        is_pivot_high = all(pivot_price > lv for lv in left_values) and \
-                        all(pivot_price >= rv for rv in right_values)
-        is_pivot_low  = all(pivot_price < lv for lv in left_values) and \
-                        all(pivot_price <= rv for rv in right_values)
+        is_pivot_high = pivot_price > left_max and pivot_price >= right_max
+        is_pivot_low  = pivot_price < left_min and pivot_price <= right_min
         volume_is_high = (norm_vol > self.p.filter_vol)
 
         if volume_is_high:
@@ -403,12 +915,12 @@ class HighVolPivotsStrategy(bt.Strategy):
 
     def log(self, txt):
         dt = self.data.datetime.datetime(0)
-        print(f"{dt.isoformat()} - {txt}")
+        self.buffer_log(f"{dt.isoformat()} - {txt}\n")
 
 # -----------------------------
 # New Strategy: MarketStructureStrategy
 # -----------------------------
-class MarketStructureStrategy(bt.Strategy):
+class MarketStructureStrategy(LogBuffer, bt.Strategy):
     """
     MarketStructureStrategy is a trend-following strategy that uses the Average True Range (ATR)
     indicator to determine entry and exit points. It aims to capture market trends while managing risk.
@@ -438,9 +950,11 @@ class MarketStructureStrategy(bt.Strategy):
     )
 
     def __init__(self):
-        self.atr = bt.indicators.ATR(self.data, period=self.p.atr_period)
+        super().__init__()
+        self.atr = cached_atr(self.data, self.p.atr_period)
         self.highest_high = bt.indicators.Highest(self.data.high, period=self.p.breakout_bars)
         self.lowest_low = bt.indicators.Lowest(self.data.low, period=self.p.breakout_bars)
+        self._atr_multiplier = self.p.atr_multiplier
         self.entry_price = None
         self.order = None
 
@@ -448,36 +962,39 @@ class MarketStructureStrategy(bt.Strategy):
         if self.order:
             return
 
+        # Each line is read once per bar; every check compares against the same ATR band
+        px = self.data.close[0]
+        band = self._atr_multiplier * self.atr[0]
         if not self.position:
+            high, low = self.data.high[0], self.data.low[0]
+            highest_high, lowest_low = self.highest_high[0], self.lowest_low[0]
             # Check for long entry
-            if self.data.high[0] > self.highest_high[0] and \
-               self.data.high[0] - self.highest_high[0] > self.p.atr_multiplier * self.atr[0]:
+            if high > highest_high and high - highest_high > band:
                 self.order = self.buy()
-                self.entry_price = self.data.close[0]
+                self.entry_price = px
                 self.log(f"Long Entry at {self.entry_price:.2f}")
 
             # Check for short entry
-            elif self.data.low[0] < self.lowest_low[0] and \
-                 self.lowest_low[0] - self.data.low[0] > self.p.atr_multiplier * self.atr[0]:
+            elif low < lowest_low and lowest_low - low > band:
                 self.order = self.sell()
-                self.entry_price = self.data.close[0]
+                self.entry_price = px
                 self.log(f"Short Entry at {self.entry_price:.2f}")
 
         else:
             # Exit long position
-            if self.position.size > 0 and self.data.close[0] < self.entry_price - (self.p.atr_multiplier * self.atr[0]):
+            if self.position.size > 0 and px < self.entry_price - band:
                 self.order = self.close()
-                self.log(f"Long Exit at {self.data.close[0]:.2f}")
+                self.log(f"Long Exit at {px:.2f}")
                 self.entry_price = None
 
             # Exit short position
-            elif self.position.size < 0 and self.data.close[0] > self.entry_price + (self.p.atr_multiplier * self.atr[0]):
+            elif self.position.size < 0 and px > self.entry_price + band:
                 self.order = self.close()
-                self.log(f"Short Exit at {self.data.close[0]:.2f}")
+                self.log(f"Short Exit at {px:.2f}")
                 self.entry_price = None
 
     def notify_order(self, order):
-        if order.status in [order.Completed]:
+        if order.status == order.Completed:
             if order.isbuy():
                 self.log(f"Buy order executed at {order.executed.price:.2f}")
             elif order.issell():
@@ -486,7 +1003,7 @@ class MarketStructureStrategy(bt.Strategy):
 
     def log(self, txt):
         dt = self.data.datetime.date(0)
-        print(f"{dt.isoformat()} - {txt}")
+        self.buffer_log(f"{dt.isoformat()} - {txt}\n")
 
 class CustomBuySell(bt.Observer):
     lines = ('buy', 'sell',)
@@ -1,10 +1,12 @@
 import os
 import sys
 import pytest
+import backtrader as bt
+import pandas as pd
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 
-# Add the parent directory to path so we can import from the main app
+# Add the parent directory to path once for the whole session so test modules can import the app modules directly
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # Load environment variables
@@ -12,6 +14,39 @@ load_dotenv()
 
 from api import app
 
+class TestData(bt.feeds.PandasData):
+    """Test data feed using pandas"""
+
+    def __init__(self, dataframe, **kwargs):
+        # Convert index to datetime if it's not already
+        if not isinstance(dataframe.index, pd.DatetimeIndex):
+            dataframe = dataframe.set_index(pd.DatetimeIndex(dataframe.index))
+
+        # Add any missing columns with default values, on a copy so shared fixtures stay untouched
+        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
+            if col not in dataframe.columns:
+                dataframe = dataframe.assign(**{col: 100000 if col == 'Volume' else dataframe['Close']})
+
+        # dataname is a backtrader param, consumed by the metaclass before __init__ runs
+        self.p.dataname = dataframe
+        super(TestData, self).__init__(**kwargs)
+
+@pytest.fixture(scope="session")
+def make_feed():
+    """
+    Return make_feed(name, dataframe), which builds the TestData feed of the data fixture
+    called name once per session. The feed's name param is set to name, so results computed
+    on it can be memoized by name too.
+    """
+    feeds = {}
+
+    def _make_feed(name, dataframe):
+        if name not in feeds:
+            feeds[name] = TestData(dataframe, name=name)
+        return feeds[name]
+
+    return _make_feed
+
 @pytest.fixture
 def client():
     """Create a test client for the FastAPI app"""
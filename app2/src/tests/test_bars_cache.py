@@ -0,0 +1,97 @@
+import pytest
+import pandas as pd
+
+import bars_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the bar cache at a temporary directory"""
+    monkeypatch.setattr(bars_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+class FakeFeed:
+    """Serves daily bars for 2022 like fetch_bars_in_chunks, recording each requested range"""
+
+    def __init__(self):
+        # No freq on the index, like Alpaca's bars (and like a round trip through Parquet)
+        index = pd.DatetimeIndex(pd.date_range(start='2022-01-01', end='2022-12-31', tz='UTC'), freq=None)
+        self.bars = pd.DataFrame({'close': range(len(index))}, index=index, dtype=float)
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        return bars_cache._slice(self.bars, start, end)
+
+
+def test_second_call_is_served_from_disk(cache_dir):
+    """Test that a cached range, or any range inside it, doesn't call fetch again"""
+    feed = FakeFeed()
+
+    first = bars_cache.cached_bars(feed, "AAPL", "2022-01-01", "2022-01-31", "1Day", today='2023-01-01')
+    second = bars_cache.cached_bars(feed, "AAPL", "2022-01-01", "2022-01-31", "1Day", today='2023-01-01')
+    inner = bars_cache.cached_bars(feed, "AAPL", "2022-01-10", "2022-01-20", "1Day", today='2023-01-01')
+
+    assert feed.calls == [("2022-01-01", "2022-01-31")]
+    pd.testing.assert_frame_equal(first, second)
+    pd.testing.assert_frame_equal(inner, feed.bars.loc["2022-01-10":"2022-01-20"])
+    assert len(list(cache_dir.glob("*.parquet"))) == 1
+
+    # A different timeframe is a different cache entry
+    bars_cache.cached_bars(feed, "AAPL", "2022-01-01", "2022-01-31", "1Min", today='2023-01-01')
+    assert len(feed.calls) == 2
+
+
+def test_longer_range_only_fetches_the_tail(cache_dir):
+    """Test that extending a cached range downloads just the missing days"""
+    feed = FakeFeed()
+    bars_cache.cached_bars(feed, "AAPL", "2022-01-01", "2022-01-31", "1Day", today='2023-01-01')
+    bars = bars_cache.cached_bars(feed, "AAPL", "2022-01-15", "2022-02-28", "1Day", today='2023-01-01')
+
+    assert feed.calls[-1] == ("2022-02-01", "2022-02-28")
+    pd.testing.assert_frame_equal(bars, feed.bars.loc["2022-01-15":"2022-02-28"])
+
+    # The merged entry now covers all of January and February
+    bars_cache.cached_bars(feed, "AAPL", "2022-01-01", "2022-02-28", "1Day", today='2023-01-01')
+    assert len(feed.calls) == 2
+
+
+def test_days_from_today_are_refetched(cache_dir):
+    """Test that bars for today, which may still change, are never served from the cache"""
+    feed = FakeFeed()
+    bars_cache.cached_bars(feed, "AAPL", "2022-03-01", "2022-03-10", "1Day", today='2022-03-10')
+    bars_cache.cached_bars(feed, "AAPL", "2022-03-01", "2022-03-10", "1Day", today='2022-03-10')
+
+    assert feed.calls == [("2022-03-01", "2022-03-10"), ("2022-03-10", "2022-03-10")]
+
+
+def test_empty_and_uncached_requests_always_fetch(cache_dir):
+    """Test that empty results aren't cached and use_cache=False bypasses the cache"""
+    calls = []
+
+    def fetch_empty(start, end):
+        calls.append((start, end))
+        return pd.DataFrame()
+
+    bars_cache.cached_bars(fetch_empty, "AAPL", "2022-01-01", "2022-01-31", "1Day")
+    bars_cache.cached_bars(fetch_empty, "AAPL", "2022-01-01", "2022-01-31", "1Day")
+    assert len(calls) == 2
+    assert not list(cache_dir.glob("*"))
+
+    bars_cache.cached_bars(FakeFeed(), "MSFT", "2022-01-01", "2022-01-31", "1Day", use_cache=False)
+    assert not list(cache_dir.glob("*"))
+
+
+def test_missing_range_matches_what_cached_bars_fetches(cache_dir):
+    """Test that missing_range reports the days cached_bars would download"""
+    feed = FakeFeed()
+    bars_cache.cached_bars(feed, "AAPL", "2022-01-01", "2022-01-31", "1Day", today='2023-01-01')
+
+    assert bars_cache.missing_range("AAPL", "2022-01-10", "2022-01-20", "1Day") is None
+    assert bars_cache.missing_range("AAPL", "2022-01-15", "2022-02-28", "1Day") == ("2022-02-01", "2022-02-28")
+    assert bars_cache.missing_range("MSFT", "2022-01-15", "2022-02-28", "1Day") == ("2022-01-15", "2022-02-28")
+    assert bars_cache.missing_range("AAPL", "2022-01-10", "2022-01-20", "1Day", use_cache=False) == ("2022-01-10", "2022-01-20")
+
+    bars_cache.cached_bars(feed, "AAPL", "2022-01-15", "2022-02-28", "1Day", today='2023-01-01')
+    assert feed.calls[-1] == ("2022-02-01", "2022-02-28")
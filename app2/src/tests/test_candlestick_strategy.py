@@ -1,94 +1,80 @@
 import pytest
+import itertools
 import backtrader as bt
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import sys
-import os
-
-# Add the parent directory to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from candlestick_strategy import CandlestickPatternStrategy
 
-class TestData(bt.feeds.PandasData):
-    """Test data feed using pandas"""
-    
-    def __init__(self, dataframe, **kwargs):
-        # Convert index to datetime if it's not already
-        if not isinstance(dataframe.index, pd.DatetimeIndex):
-            dataframe = dataframe.set_index(pd.DatetimeIndex(dataframe.index))
-        
-        # Add any missing columns with default values
-        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-            if col not in dataframe.columns:
-                if col == 'Volume':
-                    dataframe[col] = 100000
-                else:
-                    dataframe[col] = dataframe['Close']
-        
-        super(TestData, self).__init__(dataname=dataframe, **kwargs)
+# Shared volume columns for the fixtures; DataFrame copies them, so they are never mutated
+_VOL3 = np.full(3, 100_000, dtype=np.int64)
+_VOL10 = np.full(10, 100_000, dtype=np.int64)
+_VOL30 = np.full(30, 100_000, dtype=np.int64)
+_VOL100 = np.full(100, 100_000, dtype=np.int64)
+
+def _make_cerebro(feed, cash=10000, commission=None):
+    """Return a Cerebro loaded with feed and a funded broker, without the default observers"""
+    # stdstats=False skips the Broker/BuySell/Trades observers, which these tests never read
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(feed)
+    cerebro.broker.setcash(cash)
+    if commission is not None:
+        cerebro.broker.setcommission(commission=commission)
+    return cerebro
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def test_data():
     """Create a test dataset with some patterns embedded"""
     dates = pd.date_range(start='2022-01-01', periods=30)
+    i = np.arange(30)
+    
+    # Zigzag closes: five bars falling 2 a day into a low on days 5, 15, 25, then five rising
+    # into a high on days 10, 20; red candles on the way down, green on the way up
+    closes = 100 + 2.0 * np.abs(i % 10 - 5)
+    rising = (i % 10 > 5) | (i % 10 == 0)
+    opens = np.where(rising, closes - 1.5, closes + 1.5)
+    
+    # Days 5, 15, 25: Hammer (small body at the top of a long lower shadow) ending the fall
+    # Days 10, 20: Shooting star (small body at the bottom of a long upper shadow) ending the rise
+    is_hammer = i % 10 == 5
+    is_star = (i % 10 == 0) & (i > 0)
+    opens = np.where(is_hammer | is_star, closes, opens)
+    closes = np.where(is_hammer, closes + 0.5, np.where(is_star, closes - 0.5, closes))
+    body_top = np.maximum(opens, closes)
+    body_bottom = np.minimum(opens, closes)
+    highs = np.where(is_hammer, body_top + 0.05, np.where(is_star, body_top + 4.5, body_top + 0.5))
+    lows = np.where(is_hammer, body_bottom - 4.5, np.where(is_star, body_bottom - 0.05, body_bottom - 0.5))
     
-    # Create price data with some bullish and bearish setups
     data = pd.DataFrame({
-        'Open':  [100 + i + (i % 3 - 1) * 2 for i in range(30)],
-        'Close': [100 + i + (i % 5 - 2) * 1.5 for i in range(30)],
-        'Volume': [100000 for _ in range(30)]
+        'Open': opens,
+        'High': highs,
+        'Low': lows,
+        'Close': closes,
+        'Volume': _VOL30
     }, index=dates)
     
-    # Add High and Low that create some pattern-like behavior
-    # Days 5, 15, 25: Hammer-like
-    # Days 10, 20: Shooting star-like
-    highs = []
-    lows = []
-    
-    for i in range(30):
-        c = data.iloc[i]['Close']
-        o = data.iloc[i]['Open']
-        
-        if i % 10 == 5:  # Hammer-like
-            h = max(o, c) + 1
-            l = min(o, c) - 5
-        elif i % 10 == 0:  # Shooting star-like
-            h = max(o, c) + 5
-            l = min(o, c) - 1
-        else:
-            h = max(o, c) + 2
-            l = min(o, c) - 2
-            
-        highs.append(h)
-        lows.append(l)
-    
-    data['High'] = highs
-    data['Low'] = lows
-    
     return data
 
-def test_strategy_initialization():
+def test_strategy_initialization(make_feed):
     """Test that the strategy initializes correctly with various parameters"""
-    cerebro = bt.Cerebro()
-    data = TestData(pd.DataFrame({
+    data = pd.DataFrame({
         'Open': [100, 101, 102],
         'High': [105, 106, 107],
         'Low': [95, 96, 97],
         'Close': [101, 102, 103],
-        'Volume': [100000, 100000, 100000]
-    }, index=pd.date_range(start='2022-01-01', periods=3)))
+        'Volume': _VOL3
+    }, index=pd.date_range(start='2022-01-01', periods=3))
+    feed = make_feed('initialization_data', data)
     
-    cerebro.adddata(data)
+    cerebro = _make_cerebro(feed)
     
     # Test with various pattern lists
     cerebro.addstrategy(CandlestickPatternStrategy, patterns=['doji', 'hammer'])
     result = cerebro.run()
     assert len(result) == 1, "Strategy initialization failed"
     
-    cerebro = bt.Cerebro()
-    cerebro.adddata(data)
+    cerebro = _make_cerebro(feed)
     cerebro.addstrategy(CandlestickPatternStrategy, 
                         patterns=['engulfing'], 
                         stop_loss=0.1,
@@ -96,11 +82,9 @@ def test_strategy_initialization():
     result = cerebro.run()
     assert len(result) == 1, "Strategy initialization with custom parameters failed"
 
-def test_strategy_tracking_trades(test_data):
+def test_strategy_tracking_trades(test_data, make_feed):
     """Test that the strategy correctly tracks trades"""
-    cerebro = bt.Cerebro()
-    data = TestData(test_data)
-    cerebro.adddata(data)
+    cerebro = _make_cerebro(make_feed('test_data', test_data), commission=0.001)  # 0.1%
     
     # Add a trade analyzer
     cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
@@ -112,10 +96,6 @@ def test_strategy_tracking_trades(test_data):
                         take_profit=0.1,
                         exit_on_opposite=True)
     
-    # Run with initial cash
-    cerebro.broker.setcash(10000)
-    cerebro.broker.setcommission(commission=0.001)  # 0.1%
-    
     results = cerebro.run()
     
     # Check that the strategy made some trades
@@ -129,11 +109,10 @@ def test_strategy_tracking_trades(test_data):
     assert 'total' in trade_analysis
     assert trade_analysis['total']['total'] > 0
 
-def test_strategy_profit_tracking(test_data):
+def test_strategy_profit_tracking(test_data, make_feed):
     """Test that the strategy correctly tracks profitable trades"""
-    cerebro = bt.Cerebro()
-    data = TestData(test_data)
-    cerebro.adddata(data)
+    initial_cash = 10000
+    cerebro = _make_cerebro(make_feed('test_data', test_data), cash=initial_cash, commission=0.001)  # 0.1%
     
     # Configure the strategy
     cerebro.addstrategy(CandlestickPatternStrategy, 
@@ -141,11 +120,6 @@ def test_strategy_profit_tracking(test_data):
                         stop_loss=0.03,  # Tighter stop to ensure some stops are hit
                         take_profit=0.06)  # Smaller target to ensure some profits are taken
     
-    # Run with initial cash
-    initial_cash = 10000
-    cerebro.broker.setcash(initial_cash)
-    cerebro.broker.setcommission(commission=0.001)  # 0.1%
-    
     results = cerebro.run()
     strategy = results[0]
     
@@ -166,120 +140,149 @@ def test_strategy_profit_tracking(test_data):
             assert final_value <= initial_cash, f"With win rate {win_rate}, portfolio should have decreased"
 
 def test_strategy_stop_loss_and_take_profit():
-    """Test that stop loss and take profit orders work correctly"""
-    # Create a very specific dataset to test stops and targets
-    dates = pd.date_range(start='2022-01-01', periods=10)
-    data = pd.DataFrame({
-        # Day 0: Setup
-        # Day 1: Generate buy signal (hammer)
-        # Day 2-3: Price rises (test take profit)
-        # Day 4: Setup again
-        # Day 5: Generate buy signal (hammer)
-        # Day 6-7: Price falls (test stop loss)
-        'Open':  [100, 95, 101, 105, 110, 105, 101, 95, 90, 85],
-        'High':  [105, 100, 106, 110, 115, 110, 103, 101, 95, 90],
-        'Low':   [95, 85, 100, 103, 105, 95, 90, 90, 85, 80],  # Day 1, 5: Hammer-like pattern
-        'Close': [101, 98, 104, 108, 112, 108, 95, 92, 87, 82],
-        'Volume':[100000] * 10
-    }, index=dates)
-    
-    cerebro = bt.Cerebro()
-    cerebro.adddata(TestData(data))
-    
-    # Set up the strategy with clear stop loss and take profit levels
+    """Test that stop loss and take profit trigger at the right prices"""
+    # Clear stop loss and take profit levels around an entry at 100
     stop_loss = 0.05   # 5% stop loss
     take_profit = 0.08  # 8% take profit
+    check_exits = CandlestickPatternStrategy._check_exits
+    
+    # Long: target at 108 and above, stop at 95 and below
+    assert check_exits(100, 109, stop_loss, take_profit) == 'target'
+    assert check_exits(100, 108, stop_loss, take_profit) == 'target'
+    assert check_exits(100, 94, stop_loss, take_profit) == 'stop'
+    assert check_exits(100, 95, stop_loss, take_profit) == 'stop'
+    assert check_exits(100, 101, stop_loss, take_profit) is None
+    
+    # Short: mirrored, target at 92 and below, stop at 105 and above
+    assert check_exits(100, 91, stop_loss, take_profit, is_long=False) == 'target'
+    assert check_exits(100, 106, stop_loss, take_profit, is_long=False) == 'stop'
+    assert check_exits(100, 99, stop_loss, take_profit, is_long=False) is None
+
+@pytest.fixture(scope="session")
+def synthetic_100bar_df():
+    """Create a 100-bar mean-reverting price series shared by the parameter sweep"""
+    dates = pd.date_range(start='2022-01-01', periods=100)
+    rng = np.random.default_rng(42)  # For reproducibility
     
-    cerebro.addstrategy(CandlestickPatternStrategy, 
-                        patterns=['hammer'],
-                        stop_loss=stop_loss,
-                        take_profit=take_profit,
-                        consecutive_bars=1,
-                        exit_on_opposite=False)  # Disable exit on opposite to isolate stop/target tests
+    # Mean-reverting walk: price += shock + 0.05 * (100 - price), i.e. an AR(1) in the deviation
+    # x_t = 0.95 * x_{t-1} + shock_t from 100, which unrolls to x_t = sum_k 0.95**(t-k) * shock_k
+    shocks = rng.standard_normal(100)
+    decay = 0.95 ** np.arange(100)
+    walk = decay * np.cumsum(shocks / decay)
+    
+    # Ride the walk on a 20-bar zigzag so the series has falling and rising legs to reverse
+    i = np.arange(100)
+    closes = 94 + 1.2 * np.abs(i % 20 - 10) + 0.5 * walk
+    
+    # Open is the previous close with some randomness; the first bar has no previous close
+    opens = closes * 0.99
+    opens[1:] = closes[:-1] * (1 + rng.normal(0, 0.005, len(closes))[1:])
+    
+    # Add high and low with some randomness
+    highs = np.maximum(opens, closes) * (1 + abs(rng.normal(0, 0.01, len(closes))))
+    lows = np.minimum(opens, closes) * (1 - abs(rng.normal(0, 0.01, len(closes))))
+    
+    # Plant a hammer at the bottom of each dip, so the sweep trades and its exits differ by combination
+    bottom = i % 20 == 10
+    opens[bottom] = closes[bottom] - 0.3
+    highs[bottom] = closes[bottom] + 0.05
+    lows[bottom] = opens[bottom] - 4
+    
+    return pd.DataFrame({
+        'Open': opens,
+        'High': highs,
+        'Low': lows,
+        'Close': closes,
+        'Volume': _VOL100
+    }, index=dates)
+
+@pytest.fixture(scope="session")
+def synthetic_100bar_feed(make_feed, synthetic_100bar_df):
+    """synthetic_100bar_df as a TestData feed, built once per session"""
+    return make_feed('synthetic_100bar_df', synthetic_100bar_df)
+
+STOP_LOSSES = [0.02, 0.05, 0.1]
+TAKE_PROFITS = [0.05, 0.1, 0.2]
+PARAM_COMBOS = list(itertools.product(STOP_LOSSES, TAKE_PROFITS))
+
+@pytest.fixture(scope="session")
+def param_results():
+    """Per-worker memo of sweep results, shared by the test_param_combo cases and test_strategy_parameter_impact"""
+    return {}
+
+def _run_param_combo(param_results, feed, stop_loss, take_profit):
+    """Backtest the candlestick strategy for one (stop_loss, take_profit) combination, memoized in param_results"""
+    key = (stop_loss, take_profit)
+    if key in param_results:
+        return param_results[key]
+    
+    cerebro = _make_cerebro(feed)
     
-    # Add analyzers
+    cerebro.addstrategy(CandlestickPatternStrategy,
+                       patterns=['engulfing', 'hammer', 'shooting_star'],
+                       stop_loss=stop_loss,
+                       take_profit=take_profit)
+    
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
     cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
     
-    # Run with initial cash
-    cerebro.broker.setcash(10000)
-    results = cerebro.run()
+    res = cerebro.run()
+    strategy = res[0]
     
-    strategy = results[0]
     trade_analysis = strategy.analyzers.trades.get_analysis()
+    total_trades = trade_analysis.get('total', {}).get('total', 0)
+    
+    param_results[key] = {
+        'stop_loss': stop_loss,
+        'take_profit': take_profit,
+        'final_value': cerebro.broker.getvalue(),
+        'trades': total_trades,
+        'win_rate': (strategy.num_profitable_trades / strategy.num_trades) 
+                   if strategy.num_trades > 0 else 0
+    }
+    return param_results[key]
+
+@pytest.mark.parametrize("stop_loss,take_profit", PARAM_COMBOS)
+def test_param_combo(stop_loss, take_profit, synthetic_100bar_feed, param_results):
+    """Test a single stop loss / take profit combination (independent, so xdist can distribute it)"""
+    result = _run_param_combo(param_results, synthetic_100bar_feed, stop_loss, take_profit)
     
-    # Check that trades were opened and closed
-    assert 'total' in trade_analysis
-    assert trade_analysis['total']['total'] > 0
-    
-    # Check win/loss results (at least 1 win from take profit and 1 loss from stop loss)
-    assert trade_analysis['won']['total'] > 0, "No winning trades recorded"
-    assert trade_analysis['lost']['total'] > 0, "No losing trades recorded"
+    assert result['final_value'] > 0, "Portfolio value should stay positive"
+    assert 0 <= result['win_rate'] <= 1
 
-def test_strategy_parameter_impact():
+def test_strategy_parameter_impact(synthetic_100bar_feed, param_results):
     """Test how different strategy parameters affect performance"""
-    # Create test data
-    dates = pd.date_range(start='2022-01-01', periods=100)
-    np.random.seed(42)  # For reproducibility
-    
-    # Generate price data with some patterns embedded
-    closes = []
-    price = 100
-    for i in range(100):
-        # Add some mean reversion and trend
-        price_change = np.random.normal(0, 1) + 0.05 * (100 - price)
-        price += price_change
-        closes.append(price)
-    
-    # Create DataFrame
-    data = pd.DataFrame({
-        'Close': closes
-    }, index=dates)
-    
-    # Add open price with some randomness
-    data['Open'] = data['Close'].shift(1) * (1 + np.random.normal(0, 0.005, len(data)))
-    data['Open'].iloc[0] = data['Close'].iloc[0] * 0.99
-    
-    # Add high and low with some randomness
-    data['High'] = data[['Open', 'Close']].max(axis=1) * (1 + abs(np.random.normal(0, 0.01, len(data))))
-    data['Low'] = data[['Open', 'Close']].min(axis=1) * (1 - abs(np.random.normal(0, 0.01, len(data))))
-    
-    data['Volume'] = 100000
-    
-    # Strategy performance with different parameters
-    results = []
-    
-    for stop_loss in [0.02, 0.05, 0.1]:
-        for take_profit in [0.05, 0.1, 0.2]:
-            cerebro = bt.Cerebro()
-            cerebro.adddata(TestData(data))
-            cerebro.broker.setcash(10000)
-            
-            cerebro.addstrategy(CandlestickPatternStrategy,
-                               patterns=['engulfing', 'hammer', 'shooting_star'],
-                               stop_loss=stop_loss,
-                               take_profit=take_profit)
-            
-            cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-            cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
-            
-            res = cerebro.run()
-            strategy = res[0]
-            
-            trade_analysis = strategy.analyzers.trades.get_analysis()
-            total_trades = trade_analysis.get('total', {}).get('total', 0)
-            
-            results.append({
-                'stop_loss': stop_loss,
-                'take_profit': take_profit,
-                'final_value': cerebro.broker.getvalue(),
-                'trades': total_trades,
-                'win_rate': (strategy.num_profitable_trades / strategy.num_trades) 
-                           if strategy.num_trades > 0 else 0
-            })
+    # Combinations already run by test_param_combo on this worker come from param_results
+    results = [_run_param_combo(param_results, synthetic_100bar_feed, stop_loss, take_profit)
+               for stop_loss, take_profit in PARAM_COMBOS]
     
     # Check that we get different results with different parameters
     assert len(results) > 1, "No parameter combinations tested"
     
     # Check that different parameters produce different results
     final_values = [r['final_value'] for r in results]
-    assert max(final_values) != min(final_values), "All parameter combinations gave same result"
\ No newline at end of file
+    assert max(final_values) != min(final_values), "All parameter combinations gave same result"
+
+@pytest.fixture(scope="module")
+def shooting_star_df():
+    """Create five rising bars, a shooting star and two more bars to fill an order on"""
+    return pd.DataFrame({
+        'Open': [90.5, 95.5, 100.5, 105.5, 110.5, 119, 117, 116],
+        'High': [94, 99, 104, 109, 114, 130, 118, 117],
+        'Low': [89.5, 94.5, 99.5, 104.5, 109.5, 117.5, 115, 114],
+        'Close': [93, 98, 103, 108, 113, 118, 116, 115],
+        'Volume': np.full(8, 100_000, dtype=np.int64)
+    }, index=pd.date_range(start='2022-01-01', periods=8))
+
+@pytest.mark.parametrize("short_allowed", [None, True], ids=["default", "short_allowed"])
+def test_bearish_signal_while_flat(shooting_star_df, make_feed, short_allowed):
+    """Test that a bearish pattern while flat opens a short only when short_allowed is set"""
+    cerebro = _make_cerebro(make_feed('shooting_star_df', shooting_star_df))
+    params = {} if short_allowed is None else dict(short_allowed=short_allowed)
+    cerebro.addstrategy(CandlestickPatternStrategy, patterns=['shooting_star'], **params)
+    strategy = cerebro.run()[0]
+    
+    if short_allowed:
+        assert strategy.position.size < 0, "Shooting star didn't open a short"
+    else:
+        assert strategy.position.size == 0, "Strategy went short by default"
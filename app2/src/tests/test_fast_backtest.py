@@ -0,0 +1,119 @@
+import io
+import contextlib
+import pytest
+import backtrader as bt
+import pandas as pd
+import numpy as np
+
+import fast_backtest
+from strategy import SmaCross, RsiMacdStrategy
+
+@pytest.fixture(scope="module", params=[0, 1])
+def walk_data(request):
+    """Create a random-walk OHLC series; seed 1 is rounded so the SMAs tie now and then"""
+    rng = np.random.default_rng(request.param)
+    closes = 100 + np.cumsum(rng.normal(0, 1.5, 300))
+    if request.param:
+        closes = np.round(closes)
+    opens = closes + rng.normal(0, 1, 300)
+
+    return pd.DataFrame({
+        'Open': opens,
+        'High': np.maximum(opens, closes) + 1,
+        'Low': np.minimum(opens, closes) - 1,
+        'Close': closes,
+        'Volume': np.full(300, 100000)
+    }, index=pd.date_range(start='2022-01-01', periods=300))
+
+@pytest.mark.parametrize("fast_period,slow_period", [(5, 20), (10, 50), (20, 100)])
+def test_sma_cross_backtest_matches_cerebro(walk_data, fast_period, slow_period):
+    """Test that the vectorized SMA cross replay reproduces a Cerebro run"""
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=walk_data))
+    cerebro.broker.setcash(10000)
+    cerebro.addstrategy(SmaCross, sma_fast_period=fast_period, sma_slow_period=slow_period)
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+
+    with contextlib.redirect_stdout(io.StringIO()):  # SmaCross logs its trades
+        strategy = cerebro.run()[0]
+
+    result = fast_backtest.sma_cross_backtest(walk_data['Open'].to_numpy(), walk_data['Close'].to_numpy(),
+                                              fast_period, slow_period)
+
+    assert result['final_value'] == pytest.approx(cerebro.broker.getvalue())
+    assert result['trades'] == strategy.analyzers.trades.get_analysis().get('total', {}).get('total', 0)
+    assert result['num_trades'] == strategy.num_trades
+    assert result['num_profitable_trades'] == strategy.num_profitable_trades
+
+@pytest.mark.parametrize("percent", [None, 50])
+def test_float32_prices_match_float64(walk_data, percent):
+    """Test that scanning float32 prices gives the float64 result within float32 precision"""
+    opens, closes = walk_data['Open'].to_numpy(), walk_data['Close'].to_numpy()
+    expected = fast_backtest.sma_cross_backtest(opens, closes, 10, 50, commission=0.001, percent=percent)
+    result = fast_backtest.sma_cross_backtest(opens.astype(np.float32), closes.astype(np.float32), 10, 50,
+                                              commission=0.001, percent=percent)
+
+    assert np.allclose(result['final_value'], expected['final_value'], rtol=1e-5)
+    assert result['num_trades'] == expected['num_trades']
+
+def test_scan_exits_take_profit_stop_loss_and_signal():
+    """Test that exits follow the take profit / stop loss / signal ladder around the fill price"""
+    opens = np.array([100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0])
+    closes = np.array([100.0, 101.0, 106.0, 100.0, 100.0, 96.0, 100.0, 100.0, 100.0, 100.0])
+    buy = np.zeros(10, dtype=bool)
+    sell = np.zeros(10, dtype=bool)
+    buy[[0, 3, 6, 9]] = True  # The buy on the last bar can never fill
+    sell[[2, 8]] = True
+
+    entries, exits, reasons = fast_backtest.scan_exits(opens, closes, buy, sell, take_profit=0.05, stop_loss=0.03)
+
+    # Bar 2 hits both the target and the sell signal; the target wins. Bar 5 closes below the stop.
+    np.testing.assert_array_equal(entries, [0, 3, 6])
+    np.testing.assert_array_equal(exits, [2, 5, 8])
+    np.testing.assert_array_equal(reasons, [fast_backtest.EXIT_TAKE_PROFIT,
+                                            fast_backtest.EXIT_STOP_LOSS,
+                                            fast_backtest.EXIT_SIGNAL])
+
+def test_sma_cross_backtest_percent_sizer_and_commission(walk_data):
+    """Test the replay against Cerebro with main.py's PercentSizer and commission setup"""
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=walk_data))
+    cerebro.broker.setcash(1000)
+    cerebro.broker.setcommission(commission=0.0003)
+    cerebro.addsizer(bt.sizers.PercentSizer, percents=20)
+    cerebro.addstrategy(SmaCross, sma_fast_period=10, sma_slow_period=50)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cerebro.run()
+
+    result = fast_backtest.sma_cross_backtest(walk_data['Open'].to_numpy(), walk_data['Close'].to_numpy(),
+                                              10, 50, cash=1000, commission=0.0003, percent=20)
+
+    assert result['final_value'] == pytest.approx(cerebro.broker.getvalue())
+
+@pytest.mark.parametrize("params,percent", [
+    (dict(), None),
+    (dict(rsi_oversold=45, take_profit=0.03), 20),
+    (dict(rsi_period=7, macd_fast=5, macd_slow=13, macd_signal=4, rsi_oversold=40, stop_loss=0.02), None),
+    (dict(rsi_oversold=45, stop_loss=0.0), None),  # A zero stop exits on any close below the fill
+])
+def test_rsi_macd_backtest_matches_cerebro(walk_data, params, percent):
+    """Test that the vectorized RSI/MACD replay reproduces a Cerebro run, exits included"""
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=walk_data))
+    cerebro.broker.setcash(10000)
+    cerebro.broker.setcommission(commission=0.0003)
+    if percent:
+        cerebro.addsizer(bt.sizers.PercentSizer, percents=percent)
+    cerebro.addstrategy(RsiMacdStrategy, **params)
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        strategy = cerebro.run()[0]
+
+    result = fast_backtest.rsi_macd_backtest(walk_data['Open'].to_numpy(), walk_data['Close'].to_numpy(),
+                                             commission=0.0003, percent=percent, **params)
+
+    assert result['final_value'] == pytest.approx(cerebro.broker.getvalue())
+    assert result['trades'] == strategy.analyzers.trades.get_analysis().get('total', {}).get('total', 0)
+
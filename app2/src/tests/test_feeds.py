@@ -0,0 +1,32 @@
+import pytest
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from feeds import ArrayData
+
+
+@pytest.mark.parametrize("preload", [True, False])
+def test_array_data_loads_same_lines_as_pandas_data(preload):
+    """Test that ArrayData produces exactly the bars PandasData does"""
+    rng = np.random.default_rng(0)
+    closes = 100 + np.cumsum(rng.normal(0, 1, 200))
+    df = pd.DataFrame({
+        'Open': closes + rng.normal(0, 0.3, 200),
+        'High': closes + 1,
+        'Low': closes - 1,
+        'Close': closes,
+        'Volume': rng.integers(1, 10**6, 200)
+    }, index=pd.date_range(start='2022-01-03 09:30', periods=200, freq='min', tz='UTC'))
+
+    lines = []
+    for feed in (bt.feeds.PandasData, ArrayData):
+        cerebro = bt.Cerebro(stdstats=False, preload=preload)
+        cerebro.adddata(feed(dataname=df))
+        cerebro.addstrategy(bt.Strategy)
+        data = cerebro.run()[0].data
+        lines.append([np.array(line.array) for line in data.lines])
+
+    assert len(lines[1][0]) == 200
+    for expected, actual in zip(*lines):
+        np.testing.assert_array_equal(actual, expected)
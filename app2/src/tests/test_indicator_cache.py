@@ -0,0 +1,142 @@
+import pytest
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+import indicator_cache
+from strategy import StreamingSMA, StreamingBollinger, StreamingRSI, StreamingMACD
+
+@pytest.fixture
+def closes():
+    """Create a close series for indicator tests"""
+    rng = np.random.default_rng(0)
+    return 100 + np.cumsum(rng.normal(0, 1, 250))
+
+def test_sma_matches_rolling_mean(closes):
+    """Test that the cached SMA matches a pandas rolling mean bar for bar"""
+    sma = indicator_cache.get_sma(closes, 20)
+    expected = pd.Series(closes).rolling(20).mean().to_numpy()
+
+    assert sma.shape == closes.shape
+    assert np.isnan(sma[:19]).all()
+    np.testing.assert_allclose(sma[19:], expected[19:])
+
+def test_sma_is_memoized(closes):
+    """Test that identical series and period reuse the cached array"""
+    indicator_cache.clear_cache()
+    first = indicator_cache.get_sma(closes, 50)
+    second = indicator_cache.get_sma(closes.copy(), 50)
+
+    assert first is second
+    assert not first.flags.writeable
+    assert indicator_cache.get_sma(closes, 10) is not first
+
+def test_sma_is_memoized_on_caller_key(closes):
+    """Test that a caller's key stands in for the series content in the cache"""
+    indicator_cache.clear_cache()
+    key = indicator_cache.series_key(closes)
+    first = indicator_cache.get_sma(closes, 50, key)
+
+    assert indicator_cache.get_sma(closes, 50) is first  # Same digest as the default key
+    assert indicator_cache.get_sma(closes[::-1], 50, key) is first  # Looked up by key only
+    assert indicator_cache.get_sma(closes, 50, ('AAPL', '1D', closes.size)) is not first
+
+def test_sma_period_longer_than_series(closes):
+    """Test that a period longer than the series yields only NaN"""
+    sma = indicator_cache.get_sma(closes[:5], 10)
+    assert np.isnan(sma).all()
+
+def test_sma_is_exact_on_flat_series():
+    """Test that the SMA of a constant series equals the constant, like bt's fsum-based SMA"""
+    flat = np.full(50, 101.37)
+    sma = indicator_cache.get_sma(flat, 20)
+    assert (sma[19:] == 101.37).all()
+
+def test_bollinger_matches_rolling_std(closes):
+    """Test that the bands are the SMA plus/minus devfactor population standard deviations"""
+    mid, top, bot = indicator_cache.get_bollinger(closes, 20, 2.0)
+    rolling = pd.Series(closes).rolling(20)
+    std = rolling.std(ddof=0).to_numpy()
+
+    np.testing.assert_allclose(mid[19:], rolling.mean().to_numpy()[19:])
+    np.testing.assert_allclose(top[19:], mid[19:] + 2.0 * std[19:])
+    np.testing.assert_allclose(bot[19:], mid[19:] - 2.0 * std[19:])
+    assert np.isnan(top[:19]).all()
+
+def test_crossover_matches_backtrader():
+    """Test crossover signals, including a touch that isn't a cross"""
+    a = np.array([np.nan, 1.0, 2.0, 2.0, 3.0, 1.0, 2.0, 2.5])
+    b = np.array([np.nan, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0])
+    # The diff goes -1, 0, 0, 1, -1, 0, 0.5: up at bar 4, down at bar 5, up at bar 7
+    np.testing.assert_array_equal(indicator_cache.crossover(a, b, 1), [0, 0, 0, 0, 1, -1, 0, 1])
+
+def test_rolling_percentile_matches_per_window(closes):
+    """Test that every window's percentile equals np.percentile of that window"""
+    pct = indicator_cache.get_rolling_percentile(closes, 30, 95.0)
+    expected = [np.percentile(closes[i - 29:i + 1], 95.0) for i in range(29, closes.size)]
+
+    assert np.isnan(pct[:29]).all()
+    np.testing.assert_array_equal(pct[29:], expected)
+    assert indicator_cache.get_rolling_percentile(closes, 30, 95.0) is pct
+
+@pytest.mark.parametrize("runonce", [True, False])
+def test_streaming_indicators_match_backtrader(closes, runonce):
+    """Test that the streaming and cached indicators give bt's SMA, BollingerBands, RSI and MACD exactly"""
+    prices = np.concatenate([closes, np.round(closes[:100]), np.full(30, 100.0)])
+    df = pd.DataFrame({'Close': prices}, index=pd.date_range('2022-01-01', periods=prices.size))
+
+    class Pairs(bt.Strategy):
+        def __init__(self):
+            close = self.data.close
+            self.pairs = [
+                (bt.indicators.SMA(close, period=20).sma, StreamingSMA(close, period=20).sma),
+                (bt.indicators.RSI(close, period=14).rsi, StreamingRSI(close, period=14).rsi),
+            ]
+            bands = bt.indicators.BollingerBands(close, period=20, devfactor=2.0)
+            streaming = StreamingBollinger(close, period=20, devfactor=2.0)
+            self.pairs += [(getattr(bands, line), getattr(streaming, line)) for line in ('mid', 'top', 'bot')]
+            self.macd = bt.indicators.MACD(close, period_me1=12, period_me2=26, period_signal=9)
+            streaming = StreamingMACD(close, period_me1=12, period_me2=26, period_signal=9)
+            self.pairs += [(self.macd.macd, streaming.macd), (self.macd.signal, streaming.signal)]
+
+    cerebro = bt.Cerebro(stdstats=False, runonce=runonce)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df, open='Close', high='Close', low='Close',
+                                        volume=None, openinterest=None))
+    cerebro.addstrategy(Pairs)
+    strategy = cerebro.run()[0]
+
+    for expected, actual in strategy.pairs:
+        np.testing.assert_array_equal(np.array(actual.array), np.array(expected.array))
+
+    # The precomputed arrays give the same values as well
+    cached = [indicator_cache.get_sma(prices, 20), indicator_cache.get_rsi(prices, 14)]
+    cached += list(indicator_cache.get_bollinger(prices, 20, 2.0))
+    for (expected, _), actual in zip(strategy.pairs, cached):
+        np.testing.assert_array_equal(actual, np.array(expected.array))
+    macd, signal = indicator_cache.get_macd(prices, 12, 26, 9)
+    np.testing.assert_array_equal(macd, np.array(strategy.macd.macd.array))
+    np.testing.assert_array_equal(signal, np.array(strategy.macd.signal.array))
+
+def test_atr_matches_backtrader(closes):
+    """Test that the cached ATR gives bt's ATR exactly, gaps past the previous close included"""
+    rng = np.random.default_rng(1)
+    opens = closes + rng.normal(0, 1.5, closes.size)
+    df = pd.DataFrame({
+        'Open': opens,
+        'High': np.maximum(opens, closes) + rng.random(closes.size),
+        'Low': np.minimum(opens, closes) - rng.random(closes.size),
+        'Close': closes,
+    }, index=pd.date_range('2022-01-01', periods=closes.size))
+
+    class Atr(bt.Strategy):
+        def __init__(self):
+            self.atr = bt.indicators.ATR(self.data, period=14)
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df, volume=None, openinterest=None))
+    cerebro.addstrategy(Atr)
+    strategy = cerebro.run()[0]
+
+    atr = indicator_cache.get_atr(df['High'].to_numpy(), df['Low'].to_numpy(), closes, 14)
+    np.testing.assert_array_equal(atr, np.array(strategy.atr.array))
+    assert np.isnan(atr[:14]).all()
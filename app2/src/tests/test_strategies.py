@@ -1,60 +1,111 @@
+import os
 import pytest
+import itertools
 import backtrader as bt
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import sys
-import os
-
-# Add the parent directory to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from strategy import SmaCross, BollingerBreakoutStrategy, RsiMacdStrategy
+import fast_backtest
+
+# TEST_FAST=1 replays the SMA sweep with the vectorized fast_backtest instead of Cerebro;
+# test_fast_backtest.py checks that both give the same results
+TEST_FAST = os.environ.get("TEST_FAST") == "1"
+
+SMA_COMBOS = [(fast, slow) for fast, slow in itertools.product([10, 20, 50], [50, 100, 200]) if fast < slow]
+BOLLINGER_COMBOS = list(itertools.product([10, 20, 30], [1.5, 2.0, 2.5]))
+RSI_MACD_COMBOS = list(itertools.product([7, 14, 21], [8, 12, 16]))
 
-class TestData(bt.feeds.PandasData):
-    """Test data feed using pandas"""
+@pytest.fixture(scope="session")
+def sweep_results():
+    """Per-worker memo of sweep results, shared by the *_parameter_combo cases and the aggregate tests"""
+    return {}
+
+def _run_param_combo(sweep_results, feed, strategy, **params):
+    """Backtest strategy on feed with one parameter combination, memoized in sweep_results"""
+    # Keyed on the name of the fixture the feed was built from (see make_feed in conftest.py)
+    key = (feed.p.name, strategy, tuple(sorted(params.items())))
+    if key in sweep_results:
+        return sweep_results[key]
     
-    def __init__(self, dataframe, **kwargs):
-        # Convert index to datetime if it's not already
-        if not isinstance(dataframe.index, pd.DatetimeIndex):
-            dataframe = dataframe.set_index(pd.DatetimeIndex(dataframe.index))
-        
-        # Add any missing columns with default values
-        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-            if col not in dataframe.columns:
-                if col == 'Volume':
-                    dataframe[col] = 100000
-                else:
-                    dataframe[col] = dataframe['Close']
-        
-        super(TestData, self).__init__(dataname=dataframe, **kwargs)
+    cerebro = bt.Cerebro()
+    cerebro.adddata(feed)
+    cerebro.broker.setcash(10000)
+    
+    cerebro.addstrategy(strategy, **params)
+    
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+    
+    res = cerebro.run()
+    strategy = res[0]
+    
+    trade_analysis = strategy.analyzers.trades.get_analysis()
+    total_trades = trade_analysis.get('total', {}).get('total', 0)
+    
+    result = dict(params, final_value=cerebro.broker.getvalue(), trades=total_trades)
+    sweep_results[key] = result
+    return result
 
-@pytest.fixture
+def _run_sma_combo(sweep_results, feed, fast_period, slow_period):
+    if TEST_FAST:
+        params = dict(sma_fast_period=fast_period, sma_slow_period=slow_period)
+        key = (feed.p.name, fast_backtest.sma_cross_backtest, tuple(sorted(params.items())))
+        if key not in sweep_results:
+            data = feed.p.dataname
+            result = fast_backtest.sma_cross_backtest(data['Open'].to_numpy(), data['Close'].to_numpy(),
+                                                      fast_period, slow_period)
+            sweep_results[key] = dict(result, **params)
+        return sweep_results[key]
+    return _run_param_combo(sweep_results, feed, SmaCross,
+                            sma_fast_period=fast_period,
+                            sma_slow_period=slow_period)
+
+def _run_bollinger_combo(sweep_results, feed, period, devfactor):
+    return _run_param_combo(sweep_results, feed, BollingerBreakoutStrategy,
+                            period=period,
+                            devfactor=devfactor,
+                            stop_loss=0.05,
+                            take_profit=0.1)
+
+def _run_rsi_macd_combo(sweep_results, feed, rsi_period, macd_fast):
+    return _run_param_combo(sweep_results, feed, RsiMacdStrategy,
+                            rsi_period=rsi_period,
+                            rsi_oversold=30,
+                            rsi_overbought=70,
+                            macd_fast=macd_fast,
+                            macd_slow=26,
+                            macd_signal=9,
+                            stop_loss=0.05,
+                            take_profit=0.1)
+
+@pytest.fixture(scope="module")
 def trending_data():
     """Create test data with a clear trend for SMA testing"""
-    dates = pd.date_range(start='2022-01-01', periods=300)
-    
-    # Create an uptrend followed by a downtrend
-    uptrend = np.arange(100, 200, 200/150)
-    downtrend = np.arange(200, 100, -200/150)
-    prices = np.concatenate([uptrend, downtrend])
+    # A fall, then an uptrend followed by a downtrend; the fall starts the fast SMA below the
+    # slow one, so the uptrend opens with a crossover up and the downtrend closes it
+    fall = np.linspace(200, 100, 150)
+    uptrend = np.linspace(100, 200, 150)
+    downtrend = np.linspace(200, 100, 150)
+    prices = np.concatenate([fall, uptrend, downtrend])
+    n = prices.size
+    dates = pd.date_range(start='2022-01-01', periods=n)
     
     # Add some noise
-    noise = np.random.normal(0, 2, 300)
-    prices = prices + noise
+    rng = np.random.default_rng(0)  # Seeded per fixture, so the data doesn't depend on test order
+    prices = prices + rng.normal(0, 2, n)
+    opens = prices - rng.normal(0, 1, n)
     
-    data = pd.DataFrame({
+    return pd.DataFrame({
         'Close': prices,
-        'Open': prices - np.random.normal(0, 1, 300),
-        'Volume': 100000 + np.random.normal(0, 10000, 300)
+        'Open': opens,
+        'Volume': 100000 + rng.normal(0, 10000, n),
+        'High': np.maximum(opens, prices) + np.abs(rng.normal(0, 1, n)),
+        'Low': np.minimum(opens, prices) - np.abs(rng.normal(0, 1, n))
     }, index=dates)
-    
-    data['High'] = data[['Open', 'Close']].max(axis=1) + abs(np.random.normal(0, 1, 300))
-    data['Low'] = data[['Open', 'Close']].min(axis=1) - abs(np.random.normal(0, 1, 300))
-    
-    return data
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def volatile_data():
     """Create test data with high volatility for Bollinger Bands testing"""
     dates = pd.date_range(start='2022-01-01', periods=300)
@@ -74,47 +125,61 @@ def volatile_data():
     ])
     
     # Generate prices with varying volatility
-    noise = np.random.normal(0, volatility, 300)
-    prices = base + noise
+    rng = np.random.default_rng(0)  # Seeded per fixture, so the data doesn't depend on test order
+    prices = base + rng.normal(0, volatility, 300)
+    opens = prices - rng.normal(0, 1, 300)
     
-    data = pd.DataFrame({
+    return pd.DataFrame({
         'Close': prices,
-        'Open': prices - np.random.normal(0, 1, 300),
-        'Volume': 100000 + np.random.normal(0, 10000, 300)
+        'Open': opens,
+        'Volume': 100000 + rng.normal(0, 10000, 300),
+        'High': np.maximum(opens, prices) + np.abs(rng.normal(0, volatility, 300)),
+        'Low': np.minimum(opens, prices) - np.abs(rng.normal(0, volatility, 300))
     }, index=dates)
-    
-    data['High'] = data[['Open', 'Close']].max(axis=1) + abs(np.random.normal(0, volatility, 300))
-    data['Low'] = data[['Open', 'Close']].min(axis=1) - abs(np.random.normal(0, volatility, 300))
-    
-    return data
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def oscillating_data():
     """Create test data with oscillations for RSI/MACD testing"""
     dates = pd.date_range(start='2022-01-01', periods=300)
     
-    # Create a sine wave with a slight upward trend
-    t = np.linspace(0, 6*np.pi, 300)
+    # Create a sine wave with a slight upward trend, starting at its crest so the first
+    # RSI window already has down moves (bt's RSI divides by the average down move)
+    t = np.linspace(np.pi / 2, 6.5*np.pi, 300)
     sine = np.sin(t) * 20
     trend = np.linspace(100, 150, 300)
-    prices = trend + sine
     
-    data = pd.DataFrame({
+    rng = np.random.default_rng(0)  # Seeded per fixture, so the data doesn't depend on test order
+    prices = trend + sine + rng.normal(0, 1, 300)
+    opens = prices - rng.normal(0, 2, 300)
+    
+    return pd.DataFrame({
         'Close': prices,
-        'Open': prices - np.random.normal(0, 2, 300),
-        'Volume': 100000 + np.random.normal(0, 10000, 300)
+        'Open': opens,
+        'Volume': 100000 + rng.normal(0, 10000, 300),
+        'High': np.maximum(opens, prices) + np.abs(rng.normal(0, 3, 300)),
+        'Low': np.minimum(opens, prices) - np.abs(rng.normal(0, 3, 300))
     }, index=dates)
-    
-    data['High'] = data[['Open', 'Close']].max(axis=1) + abs(np.random.normal(0, 3, 300))
-    data['Low'] = data[['Open', 'Close']].min(axis=1) - abs(np.random.normal(0, 3, 300))
-    
-    return data
+
+@pytest.fixture(scope="module")
+def trending_feed(make_feed, trending_data):
+    """trending_data as its shared TestData feed, looked up once per module"""
+    return make_feed('trending_data', trending_data)
+
+@pytest.fixture(scope="module")
+def volatile_feed(make_feed, volatile_data):
+    """volatile_data as its shared TestData feed, looked up once per module"""
+    return make_feed('volatile_data', volatile_data)
+
+@pytest.fixture(scope="module")
+def oscillating_feed(make_feed, oscillating_data):
+    """oscillating_data as its shared TestData feed, looked up once per module"""
+    return make_feed('oscillating_data', oscillating_data)
 
 class TestSmaCross:
-    def test_sma_cross_strategy(self, trending_data):
+    def test_sma_cross_strategy(self, trending_feed):
         """Test that SMA Cross strategy triggers trades on crossovers"""
         cerebro = bt.Cerebro()
-        data = TestData(trending_data)
+        data = trending_feed
         cerebro.adddata(data)
         
         # Add analyzers
@@ -141,39 +206,17 @@ class TestSmaCross:
         # Since we have a clear trend with a reversal, strategy should have both long and short trades
         assert strategy.num_trades > 0, "No trades recorded by strategy"
     
-    def test_sma_parameters(self, trending_data):
+    @pytest.mark.parametrize("fast_period,slow_period", SMA_COMBOS)
+    def test_sma_parameter_combo(self, trending_feed, sweep_results, fast_period, slow_period):
+        """Test a single SMA combination (independent, so xdist can distribute it)"""
+        result = _run_sma_combo(sweep_results, trending_feed, fast_period, slow_period)
+        assert result['final_value'] > 0, "Portfolio value should stay positive"
+    
+    def test_sma_parameters(self, trending_feed, sweep_results):
         """Test SMA strategy with different parameters"""
-        # Test with different SMA combinations
-        results = []
-        
-        for fast_period in [10, 20, 50]:
-            for slow_period in [50, 100, 200]:
-                if fast_period >= slow_period:
-                    continue
-                
-                cerebro = bt.Cerebro()
-                cerebro.adddata(TestData(trending_data))
-                cerebro.broker.setcash(10000)
-                
-                cerebro.addstrategy(SmaCross,
-                                  sma_fast_period=fast_period,
-                                  sma_slow_period=slow_period)
-                
-                cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-                cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
-                
-                res = cerebro.run()
-                strategy = res[0]
-                
-                trade_analysis = strategy.analyzers.trades.get_analysis()
-                total_trades = trade_analysis.get('total', {}).get('total', 0)
-                
-                results.append({
-                    'fast_period': fast_period,
-                    'slow_period': slow_period,
-                    'final_value': cerebro.broker.getvalue(),
-                    'trades': total_trades
-                })
+        # Combinations already run by test_sma_parameter_combo on this worker come from sweep_results
+        results = [_run_sma_combo(sweep_results, trending_feed, fast_period, slow_period)
+                   for fast_period, slow_period in SMA_COMBOS]
         
         # Check that different parameters give different results
         assert len(results) > 1, "Not enough parameter combinations tested"
@@ -181,17 +224,17 @@ class TestSmaCross:
         assert max(final_values) != min(final_values), "All parameter combinations gave same result"
         
         # Shorter fast periods should generate more trades
-        fast_10_trades = [r['trades'] for r in results if r['fast_period'] == 10]
-        fast_50_trades = [r['trades'] for r in results if r['fast_period'] == 50]
+        fast_10_trades = [r['trades'] for r in results if r['sma_fast_period'] == 10]
+        fast_50_trades = [r['trades'] for r in results if r['sma_fast_period'] == 50]
         
         if fast_10_trades and fast_50_trades:
             assert sum(fast_10_trades) > sum(fast_50_trades), "Shorter fast period didn't generate more trades"
 
 class TestBollingerBreakout:
-    def test_bollinger_breakout_strategy(self, volatile_data):
+    def test_bollinger_breakout_strategy(self, volatile_feed):
         """Test that Bollinger Breakout strategy triggers trades on breakouts"""
         cerebro = bt.Cerebro()
-        data = TestData(volatile_data)
+        data = volatile_feed
         cerebro.adddata(data)
         
         # Add analyzers
@@ -219,38 +262,17 @@ class TestBollingerBreakout:
         # Strategy should have recorded trades
         assert strategy.num_trades > 0, "No trades recorded by strategy"
     
-    def test_bollinger_parameters(self, volatile_data):
+    @pytest.mark.parametrize("period,devfactor", BOLLINGER_COMBOS)
+    def test_bollinger_parameter_combo(self, volatile_feed, sweep_results, period, devfactor):
+        """Test a single Bollinger combination (independent, so xdist can distribute it)"""
+        result = _run_bollinger_combo(sweep_results, volatile_feed, period, devfactor)
+        assert result['final_value'] > 0, "Portfolio value should stay positive"
+    
+    def test_bollinger_parameters(self, volatile_feed, sweep_results):
         """Test Bollinger strategy with different parameters"""
-        # Test with different Bollinger parameters
-        results = []
-        
-        for period in [10, 20, 30]:
-            for devfactor in [1.5, 2.0, 2.5]:
-                cerebro = bt.Cerebro()
-                cerebro.adddata(TestData(volatile_data))
-                cerebro.broker.setcash(10000)
-                
-                cerebro.addstrategy(BollingerBreakoutStrategy,
-                                  period=period,
-                                  devfactor=devfactor,
-                                  stop_loss=0.05,
-                                  take_profit=0.1)
-                
-                cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-                cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
-                
-                res = cerebro.run()
-                strategy = res[0]
-                
-                trade_analysis = strategy.analyzers.trades.get_analysis()
-                total_trades = trade_analysis.get('total', {}).get('total', 0)
-                
-                results.append({
-                    'period': period,
-                    'devfactor': devfactor,
-                    'final_value': cerebro.broker.getvalue(),
-                    'trades': total_trades
-                })
+        # Combinations already run by test_bollinger_parameter_combo on this worker come from sweep_results
+        results = [_run_bollinger_combo(sweep_results, volatile_feed, period, devfactor)
+                   for period, devfactor in BOLLINGER_COMBOS]
         
         # Check that different parameters give different results
         assert len(results) > 1, "Not enough parameter combinations tested"
@@ -263,10 +285,10 @@ class TestBollingerBreakout:
             assert sum(narrow_trades) > sum(wide_trades), "Narrower bands didn't generate more trades"
 
 class TestRsiMacd:
-    def test_rsi_macd_strategy(self, oscillating_data):
+    def test_rsi_macd_strategy(self, oscillating_feed):
         """Test that RSI+MACD strategy triggers trades on appropriate signals"""
         cerebro = bt.Cerebro()
-        data = TestData(oscillating_data)
+        data = oscillating_feed
         cerebro.adddata(data)
         
         # Add analyzers
@@ -295,42 +317,17 @@ class TestRsiMacd:
         assert 'total' in trade_analysis
         assert trade_analysis['total']['total'] > 0, "No trades executed"
     
-    def test_rsi_macd_parameters(self, oscillating_data):
+    @pytest.mark.parametrize("rsi_period,macd_fast", RSI_MACD_COMBOS)
+    def test_rsi_macd_parameter_combo(self, oscillating_feed, sweep_results, rsi_period, macd_fast):
+        """Test a single RSI+MACD combination (independent, so xdist can distribute it)"""
+        result = _run_rsi_macd_combo(sweep_results, oscillating_feed, rsi_period, macd_fast)
+        assert result['final_value'] > 0, "Portfolio value should stay positive"
+    
+    def test_rsi_macd_parameters(self, oscillating_feed, sweep_results):
         """Test RSI+MACD strategy with different parameters"""
-        # Test with different RSI and MACD parameters
-        results = []
-        
-        for rsi_period in [7, 14, 21]:
-            for macd_fast in [8, 12, 16]:
-                cerebro = bt.Cerebro()
-                cerebro.adddata(TestData(oscillating_data))
-                cerebro.broker.setcash(10000)
-                
-                cerebro.addstrategy(RsiMacdStrategy,
-                                  rsi_period=rsi_period,
-                                  rsi_oversold=30,
-                                  rsi_overbought=70,
-                                  macd_fast=macd_fast,
-                                  macd_slow=26,
-                                  macd_signal=9,
-                                  stop_loss=0.05,
-                                  take_profit=0.1)
-                
-                cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-                cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
-                
-                res = cerebro.run()
-                strategy = res[0]
-                
-                trade_analysis = strategy.analyzers.trades.get_analysis()
-                total_trades = trade_analysis.get('total', {}).get('total', 0)
-                
-                results.append({
-                    'rsi_period': rsi_period,
-                    'macd_fast': macd_fast,
-                    'final_value': cerebro.broker.getvalue(),
-                    'trades': total_trades
-                })
+        # Combinations already run by test_rsi_macd_parameter_combo on this worker come from sweep_results
+        results = [_run_rsi_macd_combo(sweep_results, oscillating_feed, rsi_period, macd_fast)
+                   for rsi_period, macd_fast in RSI_MACD_COMBOS]
         
         # Check that different parameters give different results
         assert len(results) > 1, "Not enough parameter combinations tested"